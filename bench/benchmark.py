@@ -0,0 +1,129 @@
+"""Time each stage of the Nouva pipeline on synthetic programs and report the results as JSON.
+
+Usage: python bench/benchmark.py [--shapes units,nesting,...] [--sizes 10,100] [--repeat N]
+                                 [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+sys.setrecursionlimit(100000)
+
+import lark
+import corpus
+import parser
+import transpiler
+from nodes import Node
+from parser import ASTTransformer
+
+DEFAULT_SIZES = {
+    'units': [10, 100, 500],
+    'nesting': [10, 50, 100],
+    'expressions': [10, 100, 1000],
+    'switch': [10, 100, 1000],
+    'literals': [10, 100, 1000],
+}
+
+def count_ast_nodes(node):
+    """Count the token nodes of an AST."""
+    count = 0
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Node):
+            count += 1
+            stack.extend(getattr(item, field) for field in item.__slots__)
+        elif isinstance(item, list):
+            stack.extend(item)
+    return count
+
+def stages(code):
+    """The timed pipeline stages, each a function of the source code."""
+    tree = parser.get_parser().parse(code)
+    return {
+        'parse': lambda: parser.get_parser().parse(code),
+        'transform': lambda: ASTTransformer().transform(tree),
+        'parse_ast': lambda: parser.parse(code),
+        'transpile': lambda: transpiler.transpile(code),
+        'compile_ts': lambda: transpiler.compile(code, 'ts'),
+    }
+
+def measure(func, repeat):
+    """Best wall time over `repeat` runs, and peak traced memory of one extra run."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def run_case(shape, size, repeat):
+    code = corpus.generate(shape, size)
+    size_bytes = len(code.encode('utf-8'))
+    tree = parser.get_parser().parse(code)
+    tree_nodes = sum(1 for _ in tree.iter_subtrees())
+    ast_nodes = count_ast_nodes(ASTTransformer().transform(tree))
+
+    results = {}
+    for stage, func in stages(code).items():
+        seconds, peak = measure(func, repeat)
+        nodes = tree_nodes if stage == 'parse' else ast_nodes
+        results[stage] = {
+            'seconds': seconds,
+            'bytes_per_sec': size_bytes / seconds,
+            'nodes_per_sec': nodes / seconds,
+            'peak_memory_bytes': peak,
+        }
+    return {'shape': shape, 'size': size, 'bytes': size_bytes, 'tree_nodes': tree_nodes, 'ast_nodes': ast_nodes, 'stages': results}
+
+def compare(results, baseline):
+    """Print the change in time of each stage relative to a previous run."""
+    previous = {(case['shape'], case['size']): case for case in baseline['cases']}
+    for case in results['cases']:
+        old = previous.get((case['shape'], case['size']))
+        if not old:
+            continue
+        for stage, stats in case['stages'].items():
+            if stage in old['stages']:
+                ratio = stats['seconds'] / old['stages'][stage]['seconds']
+                print(f"{case['shape']:>10} {case['size']:>6} {stage:>12}: {ratio:6.2f}x time", file=sys.stderr)
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark the Nouva parser and transpiler")
+    argparser.add_argument('--shapes', default=','.join(corpus.SHAPES), help="comma-separated program shapes")
+    argparser.add_argument('--sizes', help="comma-separated program sizes (default: per-shape presets)")
+    argparser.add_argument('--repeat', type=int, default=3, help="timed runs per stage")
+    argparser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    argparser.add_argument('--compare', help="JSON results of a previous run to compare against")
+    args = argparser.parse_args()
+
+    cases = []
+    for shape in args.shapes.split(','):
+        sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else DEFAULT_SIZES[shape]
+        for size in sizes:
+            cases.append(run_case(shape, size, args.repeat))
+
+    results = {
+        'python': platform.python_version(),
+        'lark': lark.__version__,
+        'cases': cases,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__': main()
@@ -0,0 +1,74 @@
+"""Generate synthetic Nouva programs of configurable size and shape."""
+
+def name(prefix, index):
+    """Unique identifier for an index; uses letters since `x_1` would lex as a based number."""
+    suffix = ''
+    while True:
+        suffix = 'abcdefghijklmnopqrstuvwxyz'[index % 26] + suffix
+        index //= 26
+        if index == 0:
+            return prefix + suffix
+
+def units(size):
+    """Many top-level function, class and variable declarations."""
+    code = ''
+    for i in range(size):
+        fn = name('add', i)
+        cls = name('Point', i)
+        code += f"""func {fn}(alpha: number, beta: number) {'{'}
+    val {name('sqa', i)} = alpha * alpha;
+    val {name('sqb', i)} = beta * beta;
+    print("result of the computation: " + {name('sqa', i)});
+    return {name('sqa', i)} + {name('sqb', i)};
+{'}'}
+class {cls}(x: number, y: number) {'{'}
+    var {name('#len', i)}: number = x ^ 2 + y ^ 2;
+    func {name('scale', i)}(by: number | null) {'{'}
+        return x * by;
+    {'}'}
+{'}'}
+var {name('total', i)}: number = {fn}(1, 2);
+if {name('total', i)} > 100 {'{'} {name('total', i)} += 2; {'}'} else {'{'} {name('total', i)} = 0; {'}'}
+"""
+    return code
+
+def nesting(size):
+    """A single expression nested `size` levels deep."""
+    expr = '1'
+    ops = ['+', '*', '-', '/', '&&', '<']
+    for i in range(size):
+        expr = f"({expr} {ops[i % len(ops)]} {i})"
+    return f"val nested = {expr};\n"
+
+def expressions(size):
+    """`size` declarations of long operator chains mixing every precedence tier."""
+    ops = ['+', '*', '-', '/', '^', '<<', '&', '><', '|', '<', '&&', '==', '||', '>>', '!=', '+']
+    code = ''
+    for i in range(size):
+        terms = [name('v', (i + k) % 7) if k % 3 else str(k + 1) for k in range(32)]
+        chain = terms[0] + ''.join(f" {ops[(i + k) % len(ops)]} {term}" for k, term in enumerate(terms[1:]))
+        code += f"val {name('expr', i)} = {chain};\n"
+    return ''.join(f"val {name('v', k)} = {k + 2};\n" for k in range(7)) + code
+
+def switch(size):
+    """A switch block with `size` cases."""
+    cases = ''.join(f"    case {i}, {i + size} -> {'{'} print(\"case {i}\"); {'}'}\n" for i in range(size))
+    return f"val key = 3;\nswitch key {'{'}\n{cases}    default -> print(\"none\");\n{'}'}\n"
+
+def literals(size):
+    """Large array and map literals with `size` entries each."""
+    array = ', '.join(f'"item {i}"' if i % 2 else str(i) for i in range(size))
+    entries = ', '.join(f'{name("key", i)}: {i}' for i in range(size))
+    return f"val items = [{array}];\nval table = {'{'}{entries}{'}'};\n"
+
+SHAPES = {
+    'units': units,
+    'nesting': nesting,
+    'expressions': expressions,
+    'switch': switch,
+    'literals': literals,
+}
+
+def generate(shape, size):
+    """Generate a Nouva program of the given shape and size."""
+    return SHAPES[shape](size)
@@ -0,0 +1,72 @@
+"""Time edits of a large generated program through an incremental Document against full re-transpiles.
+
+Usage: python bench/editing.py [--lines N] [--edits N] [--lang js] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+
+import corpus
+import transpiler
+from document import Document
+
+def keystroke(text, n, rng):
+    """An edit typing over a digit of the text"""
+    digits = [i for i, char in enumerate(text) if char.isdigit()]
+    return rng.choice(digits), 1, str(rng.randint(0, 9))
+
+def insert_unit(text, n, rng):
+    """An edit inserting a new declaration at the start of a line"""
+    lines = [i + 1 for i, char in enumerate(text) if char == '\n']
+    return rng.choice(lines), 0, f"var {corpus.name('extra', n)} = {n};\n"
+
+EDITS = {
+    'keystroke': keystroke,
+    'insert_unit': insert_unit,
+}
+
+def main():
+    argparser = argparse.ArgumentParser(description="Compare incremental and full transpiles after each edit")
+    argparser.add_argument('--lines', type=int, default=10000, help="approximate lines of the generated program")
+    argparser.add_argument('--edits', type=int, default=50, help="edits of each kind")
+    argparser.add_argument('--lang', help="compile to this language instead of transpiling")
+    argparser.add_argument('--seed', type=int, default=0)
+    argparser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    rng = random.Random(args.seed)
+    code = corpus.generate('units', max(1, args.lines // corpus.generate('units', 1).count('\n')))
+    cases = []
+    for kind, make_edit in EDITS.items():
+        document = Document(code, args.lang)
+        incremental = full = 0.0
+        for n in range(args.edits):
+            offset, removed, inserted = make_edit(document.text, n, rng)
+            start = time.perf_counter()
+            output = document.edit(offset, removed, inserted)
+            incremental += time.perf_counter() - start
+            start = time.perf_counter()
+            expected = transpiler.compile(document.text, args.lang) if args.lang else transpiler.transpile(document.text)
+            full += time.perf_counter() - start
+            if output != expected:
+                sys.exit(f"{kind}: the incremental output differs from a full transpile after an edit at {offset}")
+        case = {'edit': kind, 'lines': code.count('\n'), 'edits': args.edits,
+                'incremental_ms': incremental / args.edits * 1000, 'full_ms': full / args.edits * 1000}
+        case['speedup'] = case['full_ms'] / case['incremental_ms']
+        cases.append(case)
+        print(f"{kind:>12}: incremental {case['incremental_ms']:.2f} ms, full {case['full_ms']:.2f} ms per edit"
+              f" ({case['speedup']:.1f}x)", file=sys.stderr)
+
+    results = {'lang': args.lang, 'cases': cases}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__': main()
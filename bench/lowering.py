@@ -0,0 +1,100 @@
+"""Time the JavaScript generated by each lowering of error handlers and range loops under a local node.
+
+Usage: python bench/lowering.py [--programs handlers,ranges] [--iterations N] [--repeat N]
+                                [--node PATH] [--output results.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+
+import transpiler
+
+# microbenchmarks, with ITERATIONS replaced by the iteration count
+PROGRAMS = {
+    # a handled invocation in a hot loop, failing on one call in 1024; `check` is declared without the `!` of
+    # throwing functions, which only the inline lowering drops from declarations
+    'handlers': """
+var failures = 0;
+func check(x: number) {
+    var low = x & 1023;
+    if low == 0 { throw x; }
+    return x;
+}
+for i : 1..ITERATIONS {
+    check(i)!catch(e: number) { failures += 1; };
+}
+""",
+    # a range loop whose end is computed by a call that loops itself
+    'ranges': """
+var total = 0;
+var parts = 4;
+func limit(count: number) {
+    var bound = 0;
+    for k : 1..count {
+        bound += ITERATIONS >> 2;
+    }
+    return bound;
+}
+for i : 1..limit(parts) {
+    total += i;
+}
+""",
+}
+
+# runs a program as a function, printing the best time of REPEAT runs in milliseconds
+HARNESS = """
+function run() {
+PROGRAM
+}
+run();
+let best = Infinity;
+for (let r = 0; r < REPEAT; r++) {
+    const start = process.hrtime.bigint();
+    run();
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e6);
+}
+console.log(best);
+"""
+
+def time_program(node, code, repeat):
+    """Best time in milliseconds of generated JavaScript over `repeat` runs."""
+    script = HARNESS.replace('PROGRAM', code).replace('REPEAT', str(repeat))
+    result = subprocess.run([node], input=script, capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+def main():
+    argparser = argparse.ArgumentParser(description="Compare the speed of the output of each lowering under node")
+    argparser.add_argument('--programs', default=','.join(PROGRAMS), help="comma-separated microbenchmarks")
+    argparser.add_argument('--iterations', type=int, default=1000000, help="loop iterations per run")
+    argparser.add_argument('--repeat', type=int, default=5, help="timed runs per program")
+    argparser.add_argument('--node', default=shutil.which('node'), help="path of the node executable")
+    argparser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+    if not args.node:
+        sys.exit("node was not found; pass --node with the path of a node executable")
+
+    cases = []
+    for program in args.programs.split(','):
+        code = PROGRAMS[program].replace('ITERATIONS', str(args.iterations))
+        case = {'program': program, 'iterations': args.iterations, 'ms': {}}
+        for lowering in transpiler.LOWERINGS:
+            case['ms'][lowering] = time_program(args.node, transpiler.compile(code, 'js', lowering=lowering), args.repeat)
+        case['speedup'] = case['ms']['closure'] / case['ms']['inline']
+        cases.append(case)
+        print(f"{program:>10}: " + ', '.join(f"{lowering} {ms:.2f} ms" for lowering, ms in case['ms'].items())
+              + f" ({case['speedup']:.2f}x)", file=sys.stderr)
+
+    version = subprocess.run([args.node, '--version'], capture_output=True, text=True).stdout.strip()
+    results = {'node': version, 'cases': cases}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__': main()
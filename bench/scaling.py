@@ -0,0 +1,59 @@
+"""Time the parallel transpilation of a large generated program on 1 to N worker processes.
+
+Usage: python bench/scaling.py [--lines N] [--jobs 1,2,4] [--lang js] [--repeat N] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+
+import corpus
+import transpiler
+from parallel import transpile_parallel
+
+def best_time(func, repeat):
+    """Fastest of several runs of a function, in seconds, with its output"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+def main():
+    cores = os.cpu_count()
+    argparser = argparse.ArgumentParser(description="Compare parallel transpiles on 1 to N processes with a serial one")
+    argparser.add_argument('--lines', type=int, default=50000, help="approximate lines of the generated program")
+    argparser.add_argument('--jobs', default=','.join(str(2 ** i) for i in range(cores.bit_length()) if 2 ** i <= cores),
+                           help="comma-separated worker counts (default: powers of two up to the cores)")
+    argparser.add_argument('--lang', help="compile to this language instead of transpiling")
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    code = corpus.generate('units', max(1, args.lines // corpus.generate('units', 1).count('\n')))
+    serial, expected = best_time(lambda: transpiler.compile(code, args.lang) if args.lang else transpiler.transpile(code),
+                                 args.repeat)
+    print(f"  serial: {serial * 1000:.0f} ms", file=sys.stderr)
+    cases = []
+    for jobs in map(int, args.jobs.split(',')):
+        # pool startup is part of each run, as it would be from the CLI
+        elapsed, output = best_time(lambda: transpile_parallel(code, args.lang, jobs), args.repeat)
+        if output != expected:
+            sys.exit(f"the output of {jobs} jobs differs from the serial output")
+        cases.append({'jobs': jobs, 'ms': elapsed * 1000, 'speedup': serial / elapsed})
+        print(f"{jobs:>3} jobs: {elapsed * 1000:.0f} ms ({serial / elapsed:.2f}x)", file=sys.stderr)
+
+    results = {'lang': args.lang, 'lines': code.count('\n'), 'bytes': len(code), 'cores': cores,
+               'serial_ms': serial * 1000, 'cases': cases}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__': main()
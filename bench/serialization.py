@@ -0,0 +1,70 @@
+"""Compare the size and speed of AST snapshots with parsing and with the text dump of `cli.py parse`.
+
+Usage: python bench/serialization.py [--shapes units,nesting] [--sizes 100,1000] [--repeat N] [--output results.json]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+# comparing the to_dict() output of loaded and parsed trees recurses as deep as the program
+sys.setrecursionlimit(100000)
+
+import corpus
+import snapshot
+from cli import debug_print_ast
+from parser import parse
+
+def best_time(func, repeat):
+    """Fastest of several runs of a function, in milliseconds, with its output"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, output
+
+def text_dump(tree):
+    buffer = io.StringIO()
+    debug_print_ast(tree.to_dict(), out=buffer)
+    return buffer.getvalue()
+
+def main():
+    argparser = argparse.ArgumentParser(description="Time dumping and loading AST snapshots of generated programs")
+    argparser.add_argument('--shapes', default='units,expressions,nesting', help="comma-separated corpus shapes")
+    argparser.add_argument('--sizes', default='100,1000', help="comma-separated sizes of each shape")
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    cases = []
+    for shape in args.shapes.split(','):
+        for size in map(int, args.sizes.split(',')):
+            code = corpus.generate(shape, size)
+            parse_ms, tree = best_time(lambda: parse(code), args.repeat)
+            case = {'shape': shape, 'size': size, 'source_bytes': len(code.encode('utf-8')), 'parse_ms': parse_ms}
+            text_ms, text = best_time(lambda: text_dump(tree), args.repeat)
+            case['text'] = {'bytes': len(text.encode('utf-8')), 'dump_ms': text_ms}
+            for format in snapshot.FORMATS:
+                dump_ms, data = best_time(lambda: snapshot.dumps(tree, format), args.repeat)
+                load_ms, loaded = best_time(lambda: snapshot.loads(data), args.repeat)
+                if loaded.to_dict() != tree.to_dict():
+                    sys.exit(f"the {format} snapshot of {shape} {size} does not load to the parsed tree")
+                size_bytes = len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+                case[format] = {'bytes': size_bytes, 'dump_ms': dump_ms, 'load_ms': load_ms}
+            cases.append(case)
+            print(f"{shape} {size}: parse {parse_ms:.1f} ms, text dump {text_ms:.1f} ms ({case['text']['bytes']} B)"
+                  + ''.join(f", {format} dump {case[format]['dump_ms']:.1f} ms / load {case[format]['load_ms']:.1f} ms"
+                            f" ({case[format]['bytes']} B)" for format in snapshot.FORMATS), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(cases, f, indent=2)
+    else:
+        print(json.dumps(cases, indent=2))
+
+if __name__ == '__main__': main()
@@ -0,0 +1,110 @@
+"""Compare the size and compile time of output with and without tree shaking, on a project of shared utilities.
+
+The project has an entry module importing every utility module, each with `size` functions, classes and values,
+and calling `used` of the public functions of each, which call up to three private ones. It is built as a bundle and as modules, and
+compiled as a single source with `compile()`.
+
+Usage: python bench/shaking.py [--modules 8] [--sizes 50,200] [--used 3] [--repeat N] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
+
+from corpus import name
+from project import Project
+from transpiler import compile
+
+def member(prefix, module, i):
+    """Unique name of the i-th declaration of a kind in a utility module"""
+    return name(f"{prefix}{name('', module)}N", i)
+
+def function(module, i):
+    """Name of the i-th function of a utility module, the first of each group of four public, the others private"""
+    return ('#' if i % 4 else '') + member('util', module, i)
+
+def utility(module, size):
+    """Source of a utility module, whose functions each call the next of their group"""
+    code = f"val {name('base', module)} = {module};\n"
+    for i in range(size):
+        calls = f" + {function(module, i + 1)}(v)" if (i + 1) % 4 and i + 1 < size else ''
+        code += f"""func {function(module, i)}(v: number) {'{'}
+    val {name('scaled', i)} = v * {i} + {name('base', module)};
+    return {name('scaled', i)}{calls};
+{'}'}
+class {member('Shape', module, i)}(x: number) {'{'}
+    var {name('#area', i)}: number = x ^ 2;
+{'}'}
+val {member('limit', module, i)} = {i} * 2;
+"""
+    return code
+
+def entry(modules, size, used):
+    """Source of the entry module, calling `used` functions spread over each utility module"""
+    code = ''.join(f"import util.{name('m', module)};\n" for module in range(modules))
+    for module in range(modules):
+        for k in range(used):
+            code += f"print({function(module, k * size // used // 4 * 4)}({k}));\n"
+    return code
+
+def best_time(func, repeat):
+    """Fastest of several runs of a function, in milliseconds, with its output"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, output
+
+def output_bytes(outputs):
+    return sum(len(output.encode('utf-8')) for output in outputs.values())
+
+def main():
+    argparser = argparse.ArgumentParser(description="Time builds and compiles of a project of shared utilities with and without tree shaking")
+    argparser.add_argument('--modules', type=int, default=8, help="number of utility modules")
+    argparser.add_argument('--sizes', default='50,200', help="comma-separated numbers of functions per utility module")
+    argparser.add_argument('--used', type=int, default=3, help="functions of each utility module called by the entry")
+    argparser.add_argument('--lang', default='js')
+    argparser.add_argument('--jobs', type=int, default=1)
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    cases = []
+    for size in map(int, args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'util'))
+            sources = [utility(module, size) for module in range(args.modules)]
+            for module, code in enumerate(sources):
+                with open(os.path.join(directory, 'util', name('m', module) + '.nv'), 'w') as f:
+                    f.write(code)
+            main_code = entry(args.modules, size, args.used)
+            main_path = os.path.join(directory, 'main.nv')
+            with open(main_path, 'w') as f:
+                f.write(main_code)
+            program = ''.join(sources) + ''.join(line for line in main_code.splitlines(True) if not line.startswith('import'))
+            case = {'size': size, 'utilities': args.modules, 'source_bytes': len(program.encode('utf-8'))}
+            for format in ('bundle', 'modules'):
+                for shake in (False, True):
+                    build = lambda: Project([directory], args.lang, format, args.jobs, shake=shake).build(main_path)
+                    elapsed, outputs = best_time(build, args.repeat)
+                    case[f"{format}{'_shaken' if shake else ''}"] = {'bytes': output_bytes(outputs), 'ms': elapsed}
+            for shake in (False, True):
+                elapsed, output = best_time(lambda: compile(program, args.lang, shake=shake), args.repeat)
+                case[f"compile{'_shaken' if shake else ''}"] = {'bytes': len(output.encode('utf-8')), 'ms': elapsed}
+            cases.append(case)
+            print(f"size {size}: " + ', '.join(f"{key} {case[key]['bytes']} B in {case[key]['ms']:.1f} ms"
+                  for key in case if isinstance(case[key], dict)), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(cases, f, indent=2)
+    else:
+        print(json.dumps(cases, indent=2))
+
+if __name__ == '__main__': main()
@@ -1,2 +1,2 @@
 
-python %0/../../src/cli.py compile %1 %2
+python %0/../../src/client.py compile %*
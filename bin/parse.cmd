@@ -1,2 +1,2 @@
 
-python %0/../../src/cli.py parse %1
+python %0/../../src/client.py parse %*
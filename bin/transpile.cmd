@@ -1,2 +1,2 @@
 
-python %0/../../src/cli.py transpile %1
+python %0/../../src/client.py transpile %*
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+
+import parser
+from options import DEFAULT_CACHE_DIR
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+PRUNE_INTERVAL = 64 # writes between size checks
+
+def file_hash(*paths):
+    """Hash the contents of files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# the tool version changes whenever the source of any compile stage does
+GRAMMAR_HASH = hashlib.sha256(parser.grammar.encode('utf-8')).hexdigest()
+TOOL_VERSION = file_hash(*(dir_path + f"/{module}.py" for module in ('nodes', 'parser', 'optimizer', 'minifier', 'symbols', 'shaker', 'transpiler', 'project')))
+
+class CompileCache:
+    """Content-addressed on-disk cache of transpiled output.
+
+    Entries are keyed on the source text, the target, the grammar and the tool version,
+    written atomically so concurrent workers can share a directory,
+    and evicted least recently used first once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def key(self, code, target):
+        parts = [TOOL_VERSION, GRAMMAR_HASH, target, code]
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, code, target):
+        """Return the cached output for a source, or None"""
+        path = self.path(self.key(code, target))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                output = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return output
+
+    def put(self, code, target, output):
+        """Store the output for a source"""
+        path = self.path(self.key(code, target))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(output)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.writes += 1
+        if self.writes % PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def fetch(self, code, target, build):
+        """Return the cached output for a source, building and storing it on a miss"""
+        output = self.get(code, target)
+        if output is None:
+            output = build()
+            self.put(code, target, output)
+        return output
+
+    def prune(self):
+        """Evict the least recently used entries until the cache fits in its size limit"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass # already evicted by another worker
+            total -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
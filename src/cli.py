@@ -1,35 +1,328 @@
-from parser import parse
-from transpiler import transpile, compile
+from parser import parse, generate_standalone
+from transpiler import Transpiler, transpile, compile, transpile_to, compile_to, LOWERINGS
+# the modules of the other subcommands are imported when used, to keep the start of a single compile short
+from options import DEFAULT_CACHE_DIR, BUILD_FORMATS, SNAPSHOT_FORMATS
+import argparse
+import glob
+import io
+import json
+import os
 import sys
+import time
 
-def debug_print_ast(node, indent=0):
-    """Recursively print contents of the AST tree."""
-    if isinstance(node, dict):
-        for key, value in node.items():
-            print(' ' * indent + f"{key}:")
-            debug_print_ast(value, indent + 2)
-    elif isinstance(node, list):
-        for i, item in enumerate(node):
-            print(' ' * indent + f"[{i}]")
-            debug_print_ast(item, indent + 2)
+LANG_ERROR = "ERROR: Please input a valid language at the end of your query string! Options: JS, TS."
+OUTPUT_EXTENSIONS = {'parse': '.ast.txt', 'transpile': '.js', 'js': '.js', 'ts': '.ts'}
+
+def debug_print_ast(node, indent=0, out=None):
+    """Print contents of the AST tree."""
+    out = out or sys.stdout
+    lines = []
+    # explicit stack of (node, indent, label) so deep nesting cannot overflow the Python stack
+    stack = [(node, indent, None)]
+    while stack:
+        node, indent, label = stack.pop()
+        if label is not None:
+            lines.append(' ' * indent + label)
+            indent += 2
+        if isinstance(node, dict):
+            stack.extend((value, indent, f"{key}:") for key, value in reversed(node.items()))
+        elif isinstance(node, list):
+            stack.extend((item, indent, f"[{i}]") for i, item in reversed(list(enumerate(node))))
+        else:
+            lines.append(' ' * indent + str(node))
+    if lines:
+        out.write('\n'.join(lines) + '\n')
+
+# compile caches of this process by directory
+caches = {}
+
+def get_cache(directory, max_bytes):
+    if directory not in caches:
+        from cache import CompileCache
+        caches[directory] = CompileCache(directory, max_bytes)
+    return caches[directory]
+
+# options of compile() that can be set on the CLI and on batch jobs
+COMPILE_OPTIONS = ('optimize', 'lowering', 'minify', 'shake')
+
+def run(func, code, lang=None, cache=None, **options):
+    """Run a CLI function on a code string and return its output"""
+    match func:
+        case 'parse':
+            buffer = io.StringIO()
+            debug_print_ast(parse(code).to_dict(), out=buffer)
+            return buffer.getvalue()
+        case 'transpile':
+            return transpile(code, cache)
+        case 'compile':
+            return compile(code, lang, cache, **options)
+    raise ValueError(f"Unknown function {func}")
+
+def read_snapshot(path):
+    """AST of a snapshot file, or of a snapshot on stdin for '-'"""
+    import snapshot
+    if path == '-':
+        return snapshot.loads(sys.stdin.buffer.read())
+    with open(path, 'rb') as f:
+        return snapshot.load(f)
+
+def emit_tree(tree, func, lang, stream, stats=None, **options):
+    """Transpile or compile a parsed program to a stream, returning the Transpiler"""
+    if func == 'compile':
+        transpiler = Transpiler(target=lang, check=True, stats=stats, **options)
     else:
-        print(' ' * indent + str(node))
+        transpiler = Transpiler(stats=stats)
+    transpiler.transpile_tree_to(tree, stream)
+    return transpiler
+
+def report_removed(removed, out=None):
+    """Write the names of the top-level units dropped by tree shaking, given by module path, to stderr"""
+    out = out or sys.stderr
+    for path, names in removed.items():
+        if names:
+            prefix = f"{path}: " if path else ''
+            out.write(f"{prefix}removed {len(names)} unused top-level unit{'' if len(names) == 1 else 's'}: {', '.join(names)}\n")
+
+def run_job(job):
+    """Run one batch job in a worker, returning the job with its output or error attached"""
+    if job.get('func') == 'compile' and not job.get('lang'):
+        return {**job, 'code': None, 'bytes': 0, 'error': LANG_ERROR}
+    try:
+        code = job.get('code')
+        if code is None:
+            with open(job['path'], 'r') as f:
+                code = f.read()
+        cache = job.get('cache') and get_cache(job['cache'], job['cache_size'])
+        hits = cache and cache.hits
+        options = {key: job[key] for key in COMPILE_OPTIONS if key in job}
+        output = run(job['func'], code, job.get('lang'), cache, **options)
+        result = {**job, 'code': None, 'bytes': len(code.encode('utf-8')), 'output': output}
+        if cache:
+            result['cached'] = cache.hits > hits
+        return result
+    except Exception as e:
+        return {**job, 'code': None, 'bytes': 0, 'error': f"{type(e).__name__}: {e}"}
+
+def expand_paths(patterns):
+    """Expand file paths and globs, keeping '-' for stdin"""
+    paths = []
+    for pattern in patterns:
+        if pattern == '-':
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"No files match {pattern}")
+        paths += [path for path in matches if os.path.isfile(path)]
+    return paths
+
+def output_path(path, base, out_dir, extension):
+    """Mirror an input path into the output directory"""
+    relative = os.path.relpath(os.path.abspath(path), base)
+    return os.path.join(out_dir, os.path.splitext(relative)[0] + extension)
+
+def output_extension(job):
+    """File extension of a job's output"""
+    if job['func'] == 'compile':
+        return OUTPUT_EXTENSIONS.get(job['lang'].lower(), '.js')
+    return OUTPUT_EXTENSIONS[job['func']]
+
+def run_batch(jobs, processes):
+    """Run jobs across a process pool, yielding results in input order"""
+    if processes == 1:
+        yield from map(run_job, jobs)
+        return
+    import multiprocessing
+    # every worker process imports the parser once and keeps it warm between jobs
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(run_job, jobs, chunksize=4)
+
+def read_ndjson(stream, func, lang):
+    """Read batch jobs from NDJSON lines: {"id", "func", "code" or "path", "lang"}"""
+    for number, line in enumerate(stream):
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        job.setdefault('id', number)
+        job.setdefault('func', func)
+        job.setdefault('lang', lang)
+        yield job
+
+def cli_batch(args, lang):
+    """Compile many sources from files, stdin or NDJSON across a process pool"""
+    start = time.perf_counter()
+    if args.ndjson:
+        jobs = list(read_ndjson(sys.stdin, args.func, lang))
+    else:
+        jobs = []
+        for path in expand_paths(args.files):
+            if path == '-':
+                jobs.append({'id': path, 'func': args.func, 'lang': lang, 'code': sys.stdin.read()})
+            else:
+                jobs.append({'id': path, 'func': args.func, 'lang': lang, 'path': path})
+    for job in jobs:
+        job['cache'] = args.cache
+        job['cache_size'] = args.cache_size
+        for key in COMPILE_OPTIONS:
+            job.setdefault(key, getattr(args, key))
+    file_paths = [job['path'] for job in jobs if 'path' in job]
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in file_paths]) if file_paths else ''
+
+    files = errors = total_bytes = hits = misses = 0
+    for result in run_batch(jobs, args.jobs):
+        files += 1
+        total_bytes += result['bytes']
+        hits += result.get('cached') is True
+        misses += result.get('cached') is False
+        if 'error' in result:
+            errors += 1
+        if args.ndjson:
+            print(json.dumps({key: result.get(key) for key in ('id', 'output', 'error', 'cached') if key in result}), flush=True)
+        elif 'error' in result:
+            print(f"ERROR: {result['id']}: {result['error']}", file=sys.stderr)
+        elif args.out_dir and 'path' in result:
+            target = output_path(result['path'], base, args.out_dir, output_extension(result))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w') as f:
+                f.write(result['output'])
+        else:
+            print(result['output'])
+
+    if args.cache:
+        # keep the cache within its size limit now that all workers have finished writing
+        get_cache(args.cache, args.cache_size).prune()
+    elapsed = time.perf_counter() - start
+    summary = f"{files} files, {total_bytes} bytes, {errors} errors in {elapsed:.2f}s"
+    if args.cache:
+        summary += f" (cache: {hits} hits, {misses} misses)"
+    print(summary, file=sys.stderr)
+    return 1 if errors else 0
 
 def cli():
     """Parse Nouva code from the CLI"""
 
-    [_, func, code, *args] = sys.argv
+    argparser = argparse.ArgumentParser(description="Parse, transpile or compile Nouva code")
+    argparser.add_argument('func', choices=['parse', 'transpile', 'compile', 'build', 'standalone', 'serve'])
+    argparser.add_argument('code', nargs='?', help="Nouva code string, '-' for stdin (or the entry file for build, or the output path for standalone, stdout by default)")
+    argparser.add_argument('lang', nargs='?', help="target language for compile: JS, TS")
+    argparser.add_argument('-f', '--files', nargs='+', metavar='PATH', help="read sources from files or globs ('-' for stdin)")
+    argparser.add_argument('--ndjson', action='store_true', help="read one JSON job per line from stdin and write one JSON result per line")
+    argparser.add_argument('-l', '--lang', dest='lang_option', help="target language for compile when reading files")
+    argparser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="number of worker processes for batches, builds and --parallel")
+    argparser.add_argument('-O', '--optimize', action='store_true', help="fold constant expressions and branches when compiling")
+    argparser.add_argument('--lowering', choices=LOWERINGS, default='closure', help="inline error handlers and cache loop bounds in the output when compiling")
+    argparser.add_argument('--minify', action='store_true', help="shorten local identifiers and drop unneeded whitespace when compiling")
+    argparser.add_argument('--shake', action='store_true', help="drop the top-level functions, classes and declarations nothing uses when compiling or building, listing them on stderr")
+    argparser.add_argument('--parallel', action='store_true', help="split a single large source at its top-level units and transpile them across --jobs processes")
+    argparser.add_argument('--ast', choices=['text', *SNAPSHOT_FORMATS], default='text', help="write the AST of parse as indented text, or as a json or binary snapshot")
+    argparser.add_argument('--from-ast', action='store_true', help="transpile or compile the snapshot at the code path ('-' for stdin) instead of parsing code")
+    argparser.add_argument('--profile', nargs='?', const='text', choices=['text', 'json'], help="write the time, counts and memory of each stage to stderr as text (default) or JSON")
+    argparser.add_argument('-o', '--out-dir', help="write batch or build outputs to this directory, mirroring the input paths")
+    argparser.add_argument('--roots', nargs='+', metavar='DIR', help="directories to resolve imports under for build (default: the entry's directory)")
+    argparser.add_argument('--format', choices=BUILD_FORMATS, default='bundle', help="build a single bundle, or an ES module per module")
+    argparser.add_argument('--address', help="Unix socket path or host:port for serve (default: a socket in the temp directory)")
+    argparser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, metavar='DIR', help=f"reuse outputs of unchanged sources from a cache directory (default: {DEFAULT_CACHE_DIR})")
+    argparser.add_argument('--cache-size', type=int, default=256, metavar='MB', help="maximum size of the cache directory")
+    args = argparser.parse_args()
+    args.cache_size *= 1024 * 1024
+
+    func, code = args.func, args.code
+    if func == 'serve':
+        from server import serve
+        serve(args.address, args.jobs, args.cache, args.cache_size)
+        return
+    if func == 'standalone':
+        # here the second argument is the output path of the generated module, or '-' or nothing for stdout
+        if code in (None, '-'):
+            generate_standalone(sys.stdout)
+        else:
+            with open(code, 'w') as f:
+                generate_standalone(f)
+        return
+    lang = args.lang_option or args.lang
+    if func in ('compile', 'build') and not lang and not args.ndjson:
+        print(LANG_ERROR)
+        return
+    if func == 'build':
+        from project import Project
+        cache = args.cache and get_cache(args.cache, args.cache_size)
+        roots = args.roots or [os.path.dirname(os.path.abspath(code))]
+        project = Project(roots, lang, args.format, args.jobs, cache, **{key: getattr(args, key) for key in COMPILE_OPTIONS})
+        outputs = project.build(code)
+        if args.out_dir:
+            for path, output in outputs.items():
+                target = os.path.join(args.out_dir, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'w') as f:
+                    f.write(output)
+        else:
+            for output in outputs.values():
+                print(output)
+        if cache:
+            cache.prune()
+        report_removed({os.path.relpath(path): names for path, names in project.removed.items()})
+        return
+    if args.files or args.ndjson:
+        if args.profile or args.parallel or args.from_ast or args.ast != 'text':
+            argparser.error("--profile, --parallel, --ast and --from-ast apply to a single source, not to --files or --ndjson")
+        sys.exit(cli_batch(args, lang))
+    options = {key: getattr(args, key) for key in COMPILE_OPTIONS}
+    if args.profile:
+        from profiler import Profile
+    stats = args.profile and Profile()
+    if args.parallel and (stats or func not in ('transpile', 'compile')):
+        argparser.error("--parallel applies to transpile and compile, without --profile")
+    tree = None
+    if args.from_ast:
+        if func not in ('transpile', 'compile') or args.parallel:
+            argparser.error("--from-ast applies to transpile and compile, without --parallel")
+        tree = read_snapshot(code)
+    elif code == '-':
+        code = sys.stdin.read()
+    cache = args.cache and get_cache(args.cache, args.cache_size)
+
     if func == 'parse':
-        ast = parse(code)
-        debug_print_ast(ast)
+        import snapshot
+        ast = stats.parse(code) if stats else parse(code)
+        if args.ast == 'text':
+            debug_print_ast(ast.to_dict())
+        elif args.ast == 'json':
+            snapshot.dump(ast, sys.stdout, 'json')
+        else:
+            sys.stdout.flush()
+            snapshot.dump(ast, sys.stdout.buffer, 'binary')
+            sys.stdout.buffer.flush()
+    elif tree is not None:
+        transpiler = emit_tree(tree, func, lang, sys.stdout, stats, **options)
+        print()
+        report_removed({None: transpiler.removed})
+    elif args.parallel:
+        from parallel import transpile_parallel
+        if func == 'compile':
+            print(transpile_parallel(code, lang, args.jobs, **options))
+        else:
+            print(transpile_parallel(code, jobs=args.jobs))
     elif func == 'transpile':
-        js_code = transpile(code)
-        print(js_code)
+        transpile_to(code, sys.stdout, cache, stats)
+        print()
+    elif func == 'compile' and args.shake:
+        # compiled without the cache, to report the units removed
+        transpiler = Transpiler(target=lang, check=True, stats=stats, **options)
+        transpiler.transpile_to(code, sys.stdout)
+        print()
+        report_removed({None: transpiler.removed})
     elif func == 'compile':
-        if len(args) > 0:
-            js_code = compile(code, args[0])
-            print(js_code)
+        compile_to(code, lang, sys.stdout, cache, stats=stats, **options)
+        print()
+    if stats:
+        # memory tracing slows the run down, so the peak is measured on a second run
+        if tree is not None:
+            stats.measure_memory(lambda: emit_tree(tree, func, lang, io.StringIO(), **options))
+        else:
+            stats.measure_memory(lambda: run(func, code, lang, **options))
+        if args.profile == 'json':
+            stats.write_json(sys.stderr)
         else:
-            print("ERROR: Please input a valid language at the end of your query string! Options: JS, TS.")
+            stats.write_report(sys.stderr)
 
 if __name__ == '__main__': cli()
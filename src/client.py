@@ -0,0 +1,87 @@
+"""Thin client for the Nouva compile daemon.
+
+Imports nothing but the standard library so that it starts quickly,
+and falls back to running cli.py in this process when no daemon can be reached.
+"""
+import json
+import os
+import runpy
+import socket
+import struct
+import sys
+import tempfile
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+CLI_FILE = dir_path + "/cli.py"
+# where Unix sockets are not available (Windows), the daemon listens on a local TCP port instead
+DEFAULT_PORT = 47183
+
+def default_address():
+    """Unix socket of this user in the temp directory, or a local TCP address without Unix sockets"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return f"127.0.0.1:{DEFAULT_PORT}"
+    getuid = getattr(os, 'getuid', None)
+    return os.path.join(tempfile.gettempdir(), f"nouva-{getuid()}.sock" if getuid else "nouva.sock")
+
+DEFAULT_ADDRESS = os.environ.get('NOUVA_DAEMON') or default_address()
+
+def tcp_address(address):
+    """Split a `host:port` address, returning (None, None) for a Unix socket path"""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return None, None
+
+def encode(message):
+    """Encode a message as length-prefixed JSON"""
+    data = json.dumps(message).encode('utf-8')
+    return struct.pack('>I', len(data)) + data
+
+def receive_exactly(sock, length):
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise ConnectionError("Daemon closed the connection")
+        data += chunk
+    return data
+
+def connect(address=DEFAULT_ADDRESS):
+    host, port = tcp_address(address)
+    if port is None:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise OSError(f"Unix sockets are not supported here, cannot connect to {address}")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    else:
+        sock = socket.create_connection((host, port))
+    return sock
+
+def request(message, address=DEFAULT_ADDRESS):
+    """Send one request to the daemon and return its response"""
+    with connect(address) as sock:
+        sock.sendall(encode(message))
+        [length] = struct.unpack('>I', receive_exactly(sock, 4))
+        return json.loads(receive_exactly(sock, length))
+
+def main():
+    """Run a CLI call through the daemon if one is running, otherwise through cli.py"""
+    args = sys.argv[1:]
+    simple_call = len(args) in (2, 3) and args[0] in ('parse', 'transpile', 'compile') and not args[1].startswith('-')
+    if simple_call and not (args[0] == 'compile' and len(args) < 3):
+        try:
+            response = request({'func': args[0], 'code': args[1], 'lang': args[2] if len(args) > 2 else None})
+        except (OSError, ValueError):
+            response = None
+        if response is not None:
+            if 'error' in response:
+                print(f"ERROR: {response['error']}", file=sys.stderr)
+                sys.exit(1)
+            # match the output of cli.py, which ends transpiled code with a newline
+            sys.stdout.write(response['output'] if args[0] == 'parse' else response['output'] + '\n')
+            return
+    sys.argv = [CLI_FILE, *args]
+    sys.path.insert(0, dir_path)
+    runpy.run_path(CLI_FILE, run_name='__main__')
+
+if __name__ == '__main__': main()
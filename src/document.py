@@ -0,0 +1,153 @@
+"""Incremental transpilation of a source kept open in an editor.
+
+A `Document` splits its text into chunks of whole top-level units and keeps the AST, emitted code and recorded
+checks of each chunk. An edit rescans the text from the first chunk it touches until the chunk boundaries line up
+with the old ones again, and reparses and re-emits only the chunks in between. If a chunk fails to parse, the whole
+text is parsed to report the error a full parse would.
+"""
+from bisect import bisect_right
+
+from nodes import Program
+from optimizer import fold_constants
+from parser import parse, unit_boundaries
+from symbols import Analyzer, Checker
+from transpiler import RecordingTranspiler
+
+class Chunk:
+    """Consecutive top-level units of a document, with their emitted code and recorded checks."""
+    __slots__ = ('length', 'units', 'code', 'checks', 'error')
+
+    def __init__(self, length, units=None, code='', checks=(), error=None):
+        self.length = length
+        self.units = units # None if the chunk does not parse
+        self.code = code
+        self.checks = checks
+        self.error = error # the error parsing or emitting the chunk
+
+class Document:
+    """A Nouva source transpiled incrementally as it is edited.
+
+    Without a language, the output is that of `transpile()`; with one, that of `compile()` with the same options.
+    Offsets count characters of the text, and `symbols()` indexes the definitions and references of its names by
+    offset. Minified and shaken output depends on the whole program, so it is not supported.
+    """
+
+    def __init__(self, code='', lang=None, **options):
+        if options.get('minify') or options.get('shake'):
+            raise ValueError("Incremental documents cannot be minified or shaken")
+        self.text = ''
+        self.options = dict(options, target=lang, check=lang is not None)
+        self.chunks = [Chunk(0, [])]
+        self.index = None
+        self.edit(0, 0, code)
+
+    def edit(self, offset, removed, inserted):
+        """Replace `removed` characters at `offset` with the inserted text, returning the new output.
+
+        The errors of the new text are raised as by a full transpile; the next edit retries the parse.
+        """
+        text = self.text
+        end = offset + removed
+        if not 0 <= offset <= end <= len(text):
+            raise ValueError(f"Edit of {offset}:{end} is outside the text of length {len(text)}")
+        self.text = text[:offset] + inserted + text[end:]
+        delta = len(inserted) - removed
+
+        starts = self.starts()
+        # chunks touching the edit, and unparsed chunks, are rescanned
+        first = bisect_right(starts, offset) - 1
+        if first > 0 and starts[first] == offset:
+            first -= 1
+        last = bisect_right(starts, end) - 1
+        unparsed = [i for i, chunk in enumerate(self.chunks) if chunk.units is None]
+        if unparsed:
+            first, last = min(first, unparsed[0]), max(last, unparsed[-1])
+        # moving the last */ changes where every block comment ends
+        close = text.rfind('*/')
+        if close >= end:
+            close += delta
+        elif close >= 0 and close + 2 > offset:
+            close = None
+        last_close = self.text.rfind('*/')
+        if last_close != close:
+            first, last = 0, len(self.chunks) - 1
+
+        # rescan until a boundary lines up with the start of an unchanged chunk
+        following = {starts[i] + delta: i for i in range(last + 1, len(self.chunks))}
+        start = starts[first]
+        boundaries = [start]
+        resumed = len(self.chunks)
+        for boundary in unit_boundaries(self.text, start, last_close):
+            boundaries.append(boundary)
+            if boundary in following:
+                resumed = following[boundary]
+                break
+        chunks = [self.parse_chunk(self.text[a:b]) for a, b in zip(boundaries, boundaries[1:])]
+        self.chunks[first:resumed] = chunks
+        self.index = None
+        return self.output()
+
+    def parse_chunk(self, code):
+        try:
+            units = parse(code).body
+        except Exception as e:
+            return Chunk(len(code), error=e)
+        transpiler = RecordingTranspiler(**self.options)
+        if transpiler.optimize:
+            units = fold_constants(Program(units)).body
+        if transpiler.check:
+            transpiler.check_names(units)
+        chunk = Chunk(len(code), units, checks=transpiler.checks)
+        try:
+            chunk.code = ''.join(transpiler.transpile_part(unit) for unit in units)
+        except Exception as e:
+            # raised once the earlier chunks have been checked, as a full transpile would
+            chunk.error = e
+        return chunk
+
+    def parsed_chunks(self):
+        """Chunks of the whole text, raising its parse error as a full parse would"""
+        if any(chunk.units is None for chunk in self.chunks):
+            # the error of a chunk may differ from that of the whole text, so the whole text is parsed
+            chunk = self.parse_chunk(self.text)
+            if chunk.units is None:
+                raise chunk.error
+            # the text parses as a whole, so it is kept as a single chunk
+            self.chunks = [chunk]
+        return self.chunks
+
+    @property
+    def tree(self):
+        """AST of the whole text"""
+        return Program([unit for chunk in self.parsed_chunks() for unit in chunk.units])
+
+    def starts(self):
+        """Offset of each chunk in the text"""
+        starts = []
+        position = 0
+        for chunk in self.chunks:
+            starts.append(position)
+            position += chunk.length
+        return starts
+
+    def symbols(self):
+        """symbols.SymbolIndex of the whole text, by offset, kept until the next edit"""
+        if self.index is None:
+            chunks = self.parsed_chunks()
+            analyzer = Analyzer()
+            for start, chunk in zip(self.starts(), chunks):
+                analyzer.walk(chunk.units, start)
+            self.index = analyzer.index
+        return self.index
+
+    def output(self):
+        """Output of the whole text, raising its errors as a full transpile would"""
+        chunks = self.parsed_chunks()
+        checker = Checker()
+        for start, chunk in zip(self.starts(), chunks):
+            checker.replay(chunk.checks, start)
+        checker.raise_errors()
+        for chunk in chunks:
+            if chunk.error:
+                raise chunk.error
+        return ''.join(chunk.code for chunk in chunks)
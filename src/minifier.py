@@ -0,0 +1,239 @@
+"""Minification of compiled output.
+
+Identifiers are shortened on the AST: a name is renamed everywhere at once, and only if every declaration of it
+is local (a parameter, a loop variable, a declaration inside a function or block, or a private top-level
+declaration) and every reference to it is in scope of one of those declarations.
+The emitted code is then compacted as text, dropping whitespace, comments and semicolons that are not needed.
+"""
+import itertools
+import re
+import string
+from collections import Counter
+
+from nodes import (Node, Program, Block, ForBlock, SwitchCase, SwitchDefault, FunctionDecl, ClassDecl, Statement,
+    Declaration, FunctionInvocation, Catcher, FunctionExpression, LambdaExpression, Identifier)
+
+# words that cannot be used as identifiers in JavaScript or TypeScript
+RESERVED = frozenset("""
+    abstract any arguments as async await boolean break case catch class const constructor continue debugger declare
+    default delete do else enum eval export extends false finally for from function get if implements import in
+    infer instanceof interface is keyof let module namespace never new null number object of package private
+    protected public readonly require return set static string super switch symbol this throw true try type typeof
+    undefined unique unknown var void while with yield
+""".split())
+# names the transpiler emits itself
+EMITTED_NAMES = frozenset(['_e$', 'parseInt', 'Infinity', 'NaN'])
+WORD = re.compile(r'[A-Za-z_$][\w$]*')
+
+def variable_name(name):
+    """JavaScript name of an identifier, as emitted by emit_identifier"""
+    return name.replace('#', '_').replace('?', '')
+
+def function_name(name):
+    """JavaScript name of an invoked function, as emitted by emit_function_invocation"""
+    return name.replace('!', '').replace('?', '').replace('#', '')
+
+# items pushed around the items of a scope: its names are visible from its ENTER item until its LEAVE item
+ENTER = object()
+LEAVE = object()
+
+class Scope:
+    __slots__ = ('names',)
+
+    def __init__(self):
+        self.names = set()
+
+class Renamer:
+    """Finds the names that can be shortened and every place they occur."""
+
+    def __init__(self):
+        self.renamable = set()
+        self.pinned = set()
+        self.words = set()
+        self.sites = [] # (holder, field, name) of every occurrence of a name
+        self.visible = Counter() # open scopes declaring each name
+
+    def declare(self, scope, body, local=True, private=False):
+        """Declare the names declared directly in a body, not in nested blocks.
+        
+        Names of a body that is not local are only renamed if they are private and `private` is set.
+        """
+        stack = [body]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack += item
+            elif isinstance(item, Statement) and isinstance(item.body, Declaration):
+                ident = item.body.identifier.Name
+                name = variable_name(ident)
+                scope.names.add(name)
+                if local or (private and ident.startswith('#')):
+                    self.renamable.add(name)
+                else:
+                    self.pinned.add(name)
+            elif isinstance(item, FunctionDecl):
+                name = variable_name(item.identifier.Name).replace('!', '')
+                scope.names.add(name)
+                self.pinned.add(name)
+            elif isinstance(item, ClassDecl):
+                scope.names.add(item.identifier)
+                self.pinned.add(item.identifier)
+
+    def declare_parameters(self, scope, parameters, local=True):
+        for param in parameters:
+            # types are not renamed, but short names must not clash with them
+            self.words.update(word for type_value in param.Type for word in WORD.findall(str(type_value)))
+            scope.names.add(param.Identifier)
+            if local:
+                self.renamable.add(param.Identifier)
+                self.sites.append((param, 'Identifier', param.Identifier))
+            else:
+                self.pinned.add(param.Identifier)
+
+    def reference(self, holder, field, name):
+        self.sites.append((holder, field, name))
+        if not self.visible[name]:
+            # a global, which keeps its name
+            self.pinned.add(name)
+
+    def push_scope(self, stack, scope, *items):
+        """Push items to be walked in a scope, with its names visible"""
+        stack += [(LEAVE, scope), *items, (ENTER, scope)]
+
+    def walk(self, tree):
+        stack = [(tree, None)]
+        while stack:
+            item, scope = stack.pop()
+            if item is ENTER:
+                self.visible.update(scope.names)
+            elif item is LEAVE:
+                self.visible.subtract(scope.names)
+            elif isinstance(item, list):
+                stack += [(subitem, scope) for subitem in item]
+            elif isinstance(item, str):
+                self.words.update(WORD.findall(item))
+            elif not isinstance(item, Node):
+                continue
+            elif isinstance(item, Program):
+                inner = Scope()
+                # top-level names are visible to other code unless they are private
+                self.declare(inner, item.body, local=False, private=True)
+                self.push_scope(stack, inner, (item.body, inner))
+            elif isinstance(item, Identifier):
+                self.reference(item, 'Name', variable_name(item.Name))
+            elif isinstance(item, Declaration):
+                # declared by the enclosing scope
+                self.sites.append((item.identifier, 'Name', variable_name(item.identifier.Name)))
+                stack += [(item.varword, scope), (item.body, scope)]
+            elif isinstance(item, FunctionInvocation):
+                self.reference(item.function, 'Name', function_name(item.function.Name))
+                stack += [(item.args, scope), (item.handler, scope)]
+            elif isinstance(item, (FunctionDecl, FunctionExpression, LambdaExpression)):
+                inner = Scope()
+                self.declare_parameters(inner, item.parameters)
+                self.declare(inner, item.body)
+                self.push_scope(stack, inner, (item.body, inner))
+            elif isinstance(item, ClassDecl):
+                # parameters become fields, so class members keep their names
+                inner = Scope()
+                self.declare_parameters(inner, item.parameters, local=False)
+                self.declare(inner, item.body, local=False)
+                self.push_scope(stack, inner, (item.body, inner))
+            elif isinstance(item, Catcher):
+                inner = Scope()
+                self.declare_parameters(inner, [item.identifier])
+                self.declare(inner, item.body)
+                self.push_scope(stack, inner, (item.body, inner))
+            elif isinstance(item, ForBlock):
+                inner = Scope()
+                inner.names.add(item.identifier)
+                self.renamable.add(item.identifier)
+                self.sites.append((item, 'identifier', item.identifier))
+                self.push_scope(stack, inner, (item.range, inner), (item.body, inner))
+            elif isinstance(item, (Block, SwitchCase, SwitchDefault)):
+                inner = Scope()
+                self.declare(inner, item.body)
+                self.push_scope(stack, inner, (item.body, inner))
+                if isinstance(item, SwitchCase):
+                    stack.append((item.cases, scope))
+            else:
+                stack += [(getattr(item, field), scope) for field in item.__slots__]
+
+    def short_names(self, excluded):
+        """Identifiers from shortest, skipping excluded words"""
+        first = string.ascii_letters
+        rest = string.ascii_letters + string.digits
+        for length in itertools.count(1):
+            for chars in itertools.product(first, *[rest] * (length - 1)):
+                name = ''.join(chars)
+                if name not in excluded:
+                    yield name
+
+    def rename(self):
+        """Give the names that can be renamed the shortest free identifiers, most frequent first"""
+        names = self.renamable - self.pinned
+        counts = Counter(name for _, _, name in self.sites if name in names)
+        first_site = {}
+        for i, (_, _, name) in enumerate(self.sites):
+            first_site.setdefault(name, i)
+        # names being renamed are not excluded, so shortening an already shortened tree changes nothing
+        seen = {name for _, _, name in self.sites} | self.pinned | self.words
+        excluded = (seen - names) | RESERVED | EMITTED_NAMES
+        order = sorted(names, key=lambda name: (-counts[name], first_site.get(name, 0)))
+        mapping = dict(zip(order, self.short_names(excluded)))
+        for holder, field, name in self.sites:
+            if name in mapping:
+                setattr(holder, field, mapping[name])
+        return mapping
+
+def shorten_identifiers(tree):
+    """Rename local and private identifiers of an AST in place to short names, returning the mapping"""
+    renamer = Renamer()
+    renamer.walk(tree)
+    return renamer.rename()
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+)
+    | (?P<error>/\*[ ]error[ ].*?\*/)
+    | (?P<comment>/\*.*?\*/|//[^\n]*)
+    | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|`(?:[^`\\]|\\.)*`)
+    | (?P<word>[\w$.]+)
+    | (?P<punct>.)
+""", re.S | re.X)
+# statements that end at a line break, where automatic semicolon insertion must still apply
+RESTRICTED = frozenset(['return', 'throw', 'break', 'continue'])
+# pairs of characters that would join into a different token
+JOINING = frozenset(['++', '--', '//', '/*'])
+
+def minify_code(code):
+    """Compact JavaScript or TypeScript, dropping unneeded whitespace, comments and semicolons.
+    
+    Comments reporting untranspiled code are kept.
+    """
+    tokens = [] # (kind, text, whether space came before it, whether a line break did)
+    spaced = newline = False
+    for match in TOKEN.finditer(code):
+        kind, text = match.lastgroup, match.group()
+        if kind == 'space' or kind == 'comment':
+            spaced = True
+            newline = newline or '\n' in text
+            continue
+        tokens.append((kind, text, spaced, newline))
+        spaced = newline = False
+
+    out = []
+    prev = None
+    for i, (kind, text, spaced, newline) in enumerate(tokens):
+        if text == ';' and (i + 1 == len(tokens) or tokens[i + 1][1] == '}'):
+            continue
+        if prev is not None:
+            prev_kind, prev_text = prev
+            joins = prev_kind == 'word' and kind == 'word'
+            # keep line breaks that may end a statement
+            if newline and (prev_text in RESTRICTED or (kind == 'word' and (joins or prev_text in ')]'))):
+                out.append('\n')
+            elif joins or (spaced and prev_text[-1] + text[0] in JOINING):
+                out.append(' ')
+        out.append(text)
+        prev = kind, text
+    return ''.join(out)
@@ -0,0 +1,237 @@
+"""AST node types of the Nouva language.
+
+Attribute names follow the key naming guidelines of the AST:
+    - Constants: UPPERCASE
+    - Collated strings: Capitalised
+    - Subtokens: lowercase
+Ensure sync with parser.py and transpiler.py
+"""
+
+class Node:
+    """Base AST node; `to_dict()` gives the equivalent `{"TOKEN": ..., <field>: ...}` dict."""
+    __slots__ = ()
+    TOKEN = None
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        return to_dict(self)
+
+class Named(Node):
+    """Base node of a name; `start` is the offset of the name in its source, unset on nodes built otherwise."""
+    __slots__ = ('start',)
+
+def to_dict(node):
+    """Convert AST nodes, and lists containing them, to the plain dict representation."""
+    # walk with an explicit stack of (container, key, item) so deep nesting cannot overflow the Python stack
+    root = [None]
+    stack = [(root, 0, node)]
+    while stack:
+        container, key, item = stack.pop()
+        if isinstance(item, Node):
+            result = {"TOKEN": item.TOKEN}
+            for field in item.__slots__:
+                result[field] = None # reserve the key to keep field order
+                stack.append((result, field, getattr(item, field)))
+        elif isinstance(item, list):
+            result = [None] * len(item)
+            for i, subitem in enumerate(item):
+                stack.append((result, i, subitem))
+        else:
+            result = item
+        container[key] = result
+    return root[0]
+
+# Root level
+class Program(Node):
+    __slots__ = ('body',)
+    TOKEN = 'Program'
+
+# fundamentals
+class Imports(Node):
+    __slots__ = ('body',)
+    TOKEN = 'imports'
+
+# blocks of code
+class Block(Node):
+    __slots__ = ('body',)
+    TOKEN = 'block'
+
+class IfBlock(Node):
+    __slots__ = ('test', 'iftrue', 'iffalse')
+    TOKEN = 'if_block'
+
+class ElseBlock(Node):
+    __slots__ = ('body',)
+    TOKEN = 'else_block'
+
+class WhileBlock(Node):
+    __slots__ = ('test', 'body')
+    TOKEN = 'while_block'
+
+class ForBlock(Named):
+    __slots__ = ('identifier', 'range', 'body')
+    TOKEN = 'for_block'
+
+class SwitchBlock(Node):
+    __slots__ = ('expression', 'body')
+    TOKEN = 'switch_block'
+
+class SwitchCase(Node):
+    __slots__ = ('cases', 'body')
+    TOKEN = 'switch_case'
+
+class SwitchDefault(Node):
+    __slots__ = ('body',)
+    TOKEN = 'switch_default'
+
+class FunctionDecl(Node):
+    __slots__ = ('identifier', 'parameters', 'body')
+    TOKEN = 'function_decl'
+
+class ClassDecl(Named):
+    __slots__ = ('identifier', 'parameters', 'body')
+    TOKEN = 'class_decl'
+
+# line of code
+class ModuleStatement(Node):
+    __slots__ = ('path',)
+    TOKEN = 'module_statement'
+
+class ImportStatement(Node):
+    __slots__ = ('path',)
+    TOKEN = 'import_statement'
+
+class Statement(Node):
+    __slots__ = ('body',)
+    TOKEN = 'statement'
+
+class Declaration(Node):
+    __slots__ = ('varword', 'identifier', 'body')
+    TOKEN = 'declaration'
+
+class DeclarationBody(Node):
+    __slots__ = ('type', 'value')
+    TOKEN = 'declaration_body'
+
+class Definition(Node):
+    __slots__ = ('identifier', 'value')
+    TOKEN = 'definition'
+
+class Reassignment(Node):
+    __slots__ = ('identifier', 'operator', 'value')
+    TOKEN = 'reassignment'
+
+class UnaryReassignment(Node):
+    __slots__ = ('identifier', 'operator')
+    TOKEN = 'unary_reassignment'
+
+class ThrowStatement(Node):
+    __slots__ = ('body',)
+    TOKEN = 'throw_statement'
+
+class ReturnStatement(Node):
+    __slots__ = ('value',)
+    TOKEN = 'return_statement'
+
+# expressions
+class FunctionInvocation(Node):
+    __slots__ = ('function', 'args', 'handler')
+    TOKEN = 'function_invocation'
+
+class Catcher(Node):
+    __slots__ = ('identifier', 'body')
+    TOKEN = 'catcher'
+
+class ArrayGetter(Node):
+    __slots__ = ('identifier', 'expression')
+    TOKEN = 'array_getter'
+
+class MapGetter(Node):
+    __slots__ = ('identifier', 'Key')
+    TOKEN = 'map_getter'
+
+class MethodCall(Node):
+    __slots__ = ('identifier', 'Key', 'arguments')
+    TOKEN = 'method_call'
+
+class TypedExpression(Node):
+    __slots__ = ('type', 'value')
+    TOKEN = 'typed_expression'
+
+class UnaryExpression(Node):
+    __slots__ = ('Operator', 'rhs')
+    TOKEN = 'unary_expression'
+
+class MathExpression(Node):
+    __slots__ = ('lhs', 'Operator', 'rhs')
+    TOKEN = 'math_expression'
+
+class BitwiseExpression(Node):
+    __slots__ = ('lhs', 'Operator', 'rhs')
+    TOKEN = 'bitwise_expression'
+
+class LogicalExpression(Node):
+    __slots__ = ('lhs', 'Operator', 'rhs')
+    TOKEN = 'logical_expression'
+
+class ComparisonExpression(Node):
+    __slots__ = ('lhs', 'Operator', 'rhs')
+    TOKEN = 'comparison_expression'
+
+class FunctionExpression(Node):
+    __slots__ = ('parameters', 'body')
+    TOKEN = 'function_expression'
+
+class LambdaExpression(Node):
+    __slots__ = ('parameters', 'body')
+    TOKEN = 'lambda_expression'
+
+# basic elements
+class FunctionParam(Named):
+    __slots__ = ('Identifier', 'Type')
+    TOKEN = 'function_param'
+
+# atomics
+class Identifier(Named):
+    __slots__ = ('Name',)
+    TOKEN = 'identifier'
+
+class Number(Node):
+    __slots__ = ('value',)
+    TOKEN = 'number'
+
+class BasedNumber(Node):
+    __slots__ = ('Base', 'Value')
+    TOKEN = 'based_number'
+
+class Array(Node):
+    __slots__ = ('indices', 'values')
+    TOKEN = 'array'
+
+class Map(Node):
+    __slots__ = ('keys', 'values')
+    TOKEN = 'map'
+
+class Range(Node):
+    __slots__ = ('start', 'end')
+    TOKEN = 'range'
+
+class LitType(Node):
+    __slots__ = ('type',)
+    TOKEN = 'lit_type'
+
+# node type of each binary operator
+BINARY_NODES = {
+    **dict.fromkeys(['^', '*', '/', '+', '-'], MathExpression),
+    **dict.fromkeys(['&', '|', '><', '<<', '>>'], BitwiseExpression),
+    **dict.fromkeys(['&&', '||'], LogicalExpression),
+    **dict.fromkeys(['==', '!=', '<', '<=', '>', '>='], ComparisonExpression),
+}
+
+NODE_TYPES = [cls for cls in list(globals().values()) if isinstance(cls, type) and issubclass(cls, Node) and cls.TOKEN]
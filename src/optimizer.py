@@ -0,0 +1,245 @@
+"""Compile-time optimizations of the AST.
+
+Operands are parenthesized on emission wherever JavaScript precedence would group them differently, so the generated
+JavaScript evaluates each expression as the AST groups it, and constant folding follows the structure of the AST.
+"""
+import math
+import re
+from fractions import Fraction
+
+from nodes import (Node, IfBlock, WhileBlock, UnaryExpression, MathExpression, BitwiseExpression, LogicalExpression,
+    ComparisonExpression, Number, BasedNumber, BINARY_NODES)
+
+MAX_SAFE_INTEGER = 2 ** 53
+
+CHAIN_NODES = (UnaryExpression, MathExpression, BitwiseExpression, LogicalExpression, ComparisonExpression)
+
+DECIMAL_NUMERAL = re.compile(r'(?:0|[1-9]\d*)?(?:\.\d+)?')
+NOT_CONSTANT = object()
+
+class Constant:
+    """A folded constant JavaScript value: a float, bool, or None for undefined."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+def constant_value(item):
+    """The JavaScript value of a literal AST item, or NOT_CONSTANT"""
+    if isinstance(item, Constant):
+        return item.value
+    if item is None or item is True or item is False:
+        return item
+    if isinstance(item, Number) and isinstance(item.value, str) and DECIMAL_NUMERAL.fullmatch(item.value):
+        # numerals with a leading zero are legacy octal in JavaScript, so they are left alone
+        return float(item.value)
+    return NOT_CONSTANT
+
+def based_value(base, digits):
+    """Exact value of a fractional number in any base from 2 to 36, or None if it is not valid"""
+    if not 2 <= base <= 36 or digits.count('.') > 1:
+        return None
+    whole, _, fraction = digits.partition('.')
+    value = Fraction(0)
+    try:
+        for digit in whole + fraction:
+            digit_value = int(digit, 36)
+            if digit_value >= base:
+                return None
+            value = value * base + digit_value
+    except ValueError:
+        return None
+    return value / base ** len(fraction)
+
+def number_literal(value):
+    """Numeric literal of a finite float"""
+    if value == 0 and math.copysign(1, value) < 0:
+        return '-0'
+    if value.is_integer() and abs(value) < MAX_SAFE_INTEGER:
+        return str(int(value))
+    return repr(value)
+
+def to_literal(value):
+    """AST item of a folded JavaScript value"""
+    if isinstance(value, float):
+        return Number(number_literal(value))
+    return value
+
+def emitted(item):
+    return to_literal(item.value) if isinstance(item, Constant) else item
+
+# JavaScript conversions
+def to_number(value):
+    if value is None:
+        return math.nan
+    return float(value)
+
+def to_int32(value):
+    number = to_number(value)
+    if math.isnan(number) or math.isinf(number):
+        return 0
+    number = int(number) & 0xFFFFFFFF
+    return number - 0x100000000 if number & 0x80000000 else number
+
+def truthy(value):
+    if isinstance(value, float):
+        return not (value == 0 or math.isnan(value))
+    return bool(value)
+
+def evaluate_unary(op, value):
+    match op:
+        case '+': return to_number(value)
+        case '-': return -to_number(value)
+        case '!': return not truthy(value)
+        case '~': return float(~to_int32(value))
+
+def evaluate_binary(op, lhs, rhs):
+    """Evaluate a Nouva operator with JavaScript semantics, returning NOT_CONSTANT if it cannot be folded exactly"""
+    match op:
+        case '+': return to_number(lhs) + to_number(rhs)
+        case '-': return to_number(lhs) - to_number(rhs)
+        case '*': return to_number(lhs) * to_number(rhs)
+        case '/':
+            if to_number(rhs) == 0:
+                return NOT_CONSTANT
+            return to_number(lhs) / to_number(rhs)
+        case '^':
+            # only fold exact integer powers, as JavaScript's Math.pow may round differently from Python's
+            base, exponent = to_number(lhs), to_number(rhs)
+            if not (base.is_integer() and exponent.is_integer() and 0 <= exponent <= 64):
+                return NOT_CONSTANT
+            result = int(base) ** int(exponent)
+            return float(result) if abs(result) < MAX_SAFE_INTEGER else NOT_CONSTANT
+        case '&': return float(to_int32(lhs) & to_int32(rhs))
+        case '|': return float(to_int32(lhs) | to_int32(rhs))
+        case '><': return float(to_int32(lhs) ^ to_int32(rhs))
+        case '<<': return float(to_int32(to_int32(lhs) << (to_int32(rhs) & 31)))
+        case '>>': return float(to_int32(lhs) >> (to_int32(rhs) & 31))
+        case '&&': return rhs if truthy(lhs) else lhs
+        case '||': return lhs if truthy(lhs) else rhs
+        case '==' | '!=':
+            if lhs is None or rhs is None:
+                equal = lhs is rhs
+            else:
+                equal = to_number(lhs) == to_number(rhs)
+            return equal if op == '==' else not equal
+        case '<': return to_number(lhs) < to_number(rhs)
+        case '<=': return to_number(lhs) <= to_number(rhs)
+        case '>': return to_number(lhs) > to_number(rhs)
+        case '>=': return to_number(lhs) >= to_number(rhs)
+    return NOT_CONSTANT
+
+def foldable(value):
+    return value is not NOT_CONSTANT and not (isinstance(value, float) and not math.isfinite(value))
+
+def reduce_unary(op, operand):
+    value = constant_value(operand)
+    if value is not NOT_CONSTANT:
+        result = evaluate_unary(op, value)
+        if foldable(result):
+            return Constant(result)
+    return UnaryExpression(op, emitted(operand))
+
+def reduce_binary(op, lhs, rhs):
+    lhs_value = constant_value(lhs)
+    if lhs_value is not NOT_CONSTANT:
+        # a constant left side decides which side a logical operator returns
+        if op == '&&':
+            return rhs if truthy(lhs_value) else lhs
+        if op == '||':
+            return lhs if truthy(lhs_value) else rhs
+        rhs_value = constant_value(rhs)
+        if rhs_value is not NOT_CONSTANT:
+            result = evaluate_binary(op, lhs_value, rhs_value)
+            if foldable(result):
+                return Constant(result)
+    return BINARY_NODES[op](emitted(lhs), op, emitted(rhs))
+
+def fold_chain(root):
+    """Fold the constant subexpressions of an operator chain, operands before their operators"""
+    order = []
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, CHAIN_NODES):
+            order.append(item)
+            stack.append(item.rhs)
+            if not isinstance(item, UnaryExpression):
+                stack.append(item.lhs)
+    folded = {}
+    for item in reversed(order):
+        rhs = folded.get(id(item.rhs), item.rhs)
+        if isinstance(item, UnaryExpression):
+            folded[id(item)] = reduce_unary(item.Operator, rhs)
+        else:
+            folded[id(item)] = reduce_binary(item.Operator, folded.get(id(item.lhs), item.lhs), rhs)
+    return emitted(folded[id(root)])
+
+def fold_number(item):
+    """Lower a based number to a plain numeric literal"""
+    if isinstance(item.value, BasedNumber):
+        value = based_value(int(item.value.Base), item.value.Value)
+        if value is not None:
+            return Number(number_literal(float(value)))
+    return item
+
+def fold_if_block(item):
+    """Keep only the branch taken by a constant test"""
+    value = constant_value(item.test)
+    if value is NOT_CONSTANT:
+        return item
+    if truthy(value):
+        return item.iftrue
+    if item.iffalse is None or item.iffalse.body is None:
+        return []
+    return item.iffalse.body
+
+def fold_while_block(item):
+    """Remove a loop whose constant test is false"""
+    value = constant_value(item.test)
+    if value is not NOT_CONSTANT and not truthy(value):
+        return []
+    return item
+
+FOLDERS = {
+    Number: fold_number,
+    IfBlock: fold_if_block,
+    WhileBlock: fold_while_block,
+    **dict.fromkeys(CHAIN_NODES, fold_chain),
+}
+
+def replace(value, replacements):
+    if isinstance(value, Node):
+        return replacements.get(id(value), value)
+    if isinstance(value, list):
+        return [replace(item, replacements) for item in value]
+    return value
+
+def fold_constants(tree):
+    """Fold constant expressions, lower based numbers and remove constant branches of an AST"""
+    # collect nodes parents first, marking operators nested in a chain so only its outermost operator folds it
+    order = []
+    nested = set()
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Node):
+            order.append(item)
+            children = [getattr(item, field) for field in item.__slots__]
+            if isinstance(item, CHAIN_NODES):
+                nested.update(id(child) for child in children if isinstance(child, CHAIN_NODES))
+            stack += children
+        elif isinstance(item, list):
+            stack += item
+
+    # fold children before parents
+    replacements = {}
+    for node in reversed(order):
+        for field in node.__slots__:
+            setattr(node, field, replace(getattr(node, field), replacements))
+        folder = FOLDERS.get(node.__class__)
+        if folder and id(node) not in nested:
+            result = folder(node)
+            if result is not node:
+                replacements[id(node)] = result
+    return replace(tree, replacements)
@@ -0,0 +1,12 @@
+"""Values of the options that modules share with the CLI.
+
+This module imports nothing, so the CLI can list the options of its subcommands without importing their modules.
+"""
+# default directory of a cache.CompileCache
+DEFAULT_CACHE_DIR = '.nouva-cache'
+# formats of project builds:
+# - bundle: a single file with every module, dependencies first
+# - modules: an ES module per module, importing the public top-level names of the modules it imports
+BUILD_FORMATS = ('bundle', 'modules')
+# formats of AST snapshots, described in snapshot.py
+SNAPSHOT_FORMATS = ('json', 'binary')
@@ -0,0 +1,82 @@
+"""Parallel transpilation of a single large source.
+
+The source is split into a few chunks of whole top-level units per worker, and each chunk is parsed and emitted in
+a worker process. The output and the errors are those of the serial `transpile()` or `compile()`.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lark.exceptions import UnexpectedInput
+
+from parser import parse, unit_boundaries, ParseError, detached_error
+from symbols import Checker
+from transpiler import Transpiler, RecordingTranspiler
+
+# chunks per worker, so a worker given a slower chunk does not hold up the others
+CHUNKS_PER_JOB = 4
+
+def split_source(code, count):
+    """Offsets splitting a code string at unit boundaries into at most `count` chunks of similar size, then its end"""
+    size = len(code) / max(count, 1)
+    offsets = [0]
+    for boundary in unit_boundaries(code):
+        if boundary - offsets[-1] >= size or boundary == len(code):
+            offsets.append(boundary)
+    if offsets[-1] != len(code):
+        offsets.append(len(code))
+    return offsets
+
+def transpile_chunk(code, start, line, column, options):
+    """Output and recorded checks of a chunk starting at an offset, line and column of the source.
+
+    An error emitting the chunk is returned rather than raised, to be raised once the checks before it are replayed.
+    """
+    try:
+        tree = parse(code)
+    except UnexpectedInput as e:
+        raise detached_error(e, start, line, column) from None
+    transpiler = RecordingTranspiler(**options)
+    buffer = io.StringIO()
+    try:
+        transpiler.transpile_tree_to(tree, buffer)
+    except Exception as e:
+        return None, transpiler.checks, e
+    return buffer.getvalue(), transpiler.checks, None
+
+def transpile_parallel(code, lang=None, jobs=None, **options):
+    """Transpile a code string, or compile it to a language, across `jobs` worker processes.
+
+    Options are those of `compile()`. Minified and shaken output depends on the whole program, so it is produced
+    serially.
+    """
+    options = dict(options, target=lang, check=lang is not None)
+    if options.get('minify') or options.get('shake'):
+        return Transpiler(**options).transpile(code)
+    jobs = jobs or os.cpu_count()
+    offsets = split_source(code, jobs * CHUNKS_PER_JOB)
+    chunks = []
+    line = column = 1
+    for start, end in zip(offsets, offsets[1:]):
+        chunks.append((code[start:end], start, line, column, options))
+        newlines = code.count('\n', start, end)
+        line += newlines
+        column = end - code.rfind('\n', start, end) if newlines else column + end - start
+    if jobs == 1 or len(chunks) == 1:
+        results = (transpile_chunk(*chunk) for chunk in chunks)
+    else:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = pool.map(transpile_chunk, *zip(*chunks))
+    try:
+        results = list(results)
+    except ParseError:
+        # the error of a chunk may differ from that of the whole source, so the whole source is parsed
+        return Transpiler(**options).transpile(code)
+    checker = Checker()
+    for (output, checks, error), chunk in zip(results, chunks):
+        checker.replay(checks, chunk[1])
+    checker.raise_errors()
+    for output, checks, error in results:
+        if error:
+            raise error
+    return ''.join(output for output, _, _ in results)
@@ -1,37 +1,120 @@
+import hashlib
 import os
+import re
+import sys
 
+import lark
 from lark import Lark, Transformer, Tree, Token
 
+from nodes import (Program, Imports, Block, IfBlock, ElseBlock, WhileBlock, ForBlock, SwitchBlock,
+    SwitchCase, SwitchDefault, FunctionDecl, ClassDecl, ModuleStatement, ImportStatement,
+    Statement, Declaration, DeclarationBody, Definition, Reassignment, UnaryReassignment,
+    ThrowStatement, ReturnStatement, FunctionInvocation, Catcher, ArrayGetter, MapGetter,
+    MethodCall, TypedExpression, UnaryExpression, FunctionExpression, LambdaExpression, FunctionParam,
+    Identifier, Number, BasedNumber, Array, Map, Range, LitType, BINARY_NODES)
+
 dir_path = os.path.dirname(os.path.realpath(__file__))
 GRAMMAR_FILE = dir_path + "/grammar.lark"
+CACHE_DIR = dir_path + "/__pycache__"
 
 # Load grammar from file
 with open(GRAMMAR_FILE, 'r') as f:
     grammar = f.read()
 
-# Create parser
-parser = Lark(grammar, start='start', parser='lalr')
+def cache_file(grammar):
+    """Path of the serialized parser for a grammar under the installed Lark version."""
+    grammar_hash = hashlib.sha256(grammar.encode('utf-8')).hexdigest()[:16]
+    return f"{CACHE_DIR}/grammar.{grammar_hash}.lark-{lark.__version__}.cache"
+
+def remove_stale_caches(current):
+    """Remove the serialized parsers of other grammars or Lark versions than that of the current cache file."""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = f"{CACHE_DIR}/{name}"
+        if name.startswith('grammar.') and name.endswith('.cache') and path != current:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def build_parser(grammar, cache=True, transformer=None):
+    """Build the LALR parser, loading its tables from the on-disk cache when possible.
+    
+    With a transformer, it is applied as each rule is reduced, so the parser returns its result directly.
+    """
+    options = {'transformer': transformer} if transformer else {}
+    if cache:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Lark verifies the stored hash on load and rebuilds the cache if it is stale
+            options['cache'] = cache_file(grammar)
+        except OSError:
+            pass
+    path = options.get('cache')
+    writes = path is not None and not os.path.exists(path)
+    lalr_parser = Lark(grammar, start='start', parser='lalr', **options)
+    if writes and os.path.exists(path):
+        # the cache of each edit of the grammar supersedes the previous one
+        remove_stale_caches(path)
+    return lalr_parser
+
+USE_CACHE = os.environ.get('NOUVA_PARSER_CACHE') != '0'
+
+# parser of Lark trees, built on first use by get_parser(); see ast_parser below for the AST
+tree_parser = None
+
+def get_parser():
+    """Parser of Lark trees, which only debugging, profiling and standalone generation need"""
+    global tree_parser
+    if tree_parser is None:
+        tree_parser = build_parser(grammar, cache=USE_CACHE)
+    return tree_parser
+
+ESCAPE_SEQUENCE = re.compile(r'\\\s*(\S)')
+
+def unescape(token):
+    """Strip the delimiters from a quoted token and resolve its escapes."""
+    return ESCAPE_SEQUENCE.sub(r'\1', token[1:-1])
 
 def extract_chars(token):
-    """Recursively extract characters from nested token."""
-    if isinstance(token, str):
-        return token
-    elif isinstance(token, list):
-        return ''.join(extract_chars(t) for t in token)
-    elif isinstance(token, Tree):
-        return extract_chars(token.children)
-    elif isinstance(token, Token):
-        return token.value
-    else:
-        return ''
+    """Extract characters from nested token."""
+    chars = []
+    stack = [token]
+    while stack:
+        token = stack.pop()
+        if isinstance(token, str):
+            chars.append(token)
+        elif isinstance(token, list):
+            stack.extend(reversed(token))
+        elif isinstance(token, Tree):
+            stack.extend(reversed(token.children))
+    return ''.join(chars)
+
+# precedence of the binary operators of a chain, from the loosest binding to the tightest
+OPERATOR_TIERS = {
+    '||': 1,
+    '&&': 2,
+    '==': 3, '!=': 3, '<': 3, '<=': 3, '>': 3, '>=': 3,
+    '|': 4,
+    '><': 5,
+    '&': 6,
+    '<<': 7, '>>': 7,
+    '+': 8, '-': 8,
+    '*': 9, '/': 9,
+}
+
+def named(node, token):
+    """Set the start of a named node to the offset of its name token"""
+    node.start = token.start_pos
+    return node
 
 class ASTTransformer(Transformer):
     """Build AST nodes for the parsed language"""
     
-    """Naming guideliness for keys:
-        - Constants: UPPERCASE
-        - Collated strings: Capitalised
-        - Subtokens: lowercase
+    """Nodes are the classes of nodes.py, whose attribute names follow its naming guidelines.
        Ensure sync with transpiler.py
     """
 
@@ -40,115 +123,121 @@ class ASTTransformer(Transformer):
     
     # Root level
     def start(self, items):
-        return {"TOKEN": "Program", "body": items}
+        return Program(items)
     
     # fundamentals
     def imports(self, items):
-        return {"TOKEN": "imports", "body": items}
+        return Imports(items)
     def unit(self, items):
         return items[0]
     
     # blocks of code
     def block(self, items):
-        return {"TOKEN": "block", "body": items}
+        return Block(items)
     control_block = passthrough
     def if_block(self, items):
-        return {"TOKEN": "if_block", "test": items[1], "iftrue": items[2], "iffalse": items[3] or None}
+        return IfBlock(items[1], items[2], items[3] or None)
     def else_block(self, items):
-        return {"TOKEN": "else_block", "body": items[1]}
+        return ElseBlock(items[1])
     def while_block(self, items):
-        return {"TOKEN": "while_block", "test": items[1], "body": items[2]}
+        return WhileBlock(items[1], items[2])
     def for_block(self, items):
-        return {"TOKEN": "for_block", "identifier": items[1], "range": items[2], "body": items[3]}
+        return named(ForBlock(sys.intern(items[1].value), items[2], items[3]), items[1])
     def switch_block(self, items):
-        return {"TOKEN": "switch_block", "expression": items[1], "body": items[2]}
+        return SwitchBlock(items[1], items[2])
 
     switch_body = passthrough
     def switch_case(self, items):
-        return {"TOKEN": "switch_case", "cases": items[1], "body": items[2]}
+        return SwitchCase(items[1], items[2])
     def switch_default(self, items):
-        return {"TOKEN": "switch_default", "body": items[1]}
+        return SwitchDefault(items[1])
     
     def function_decl(self, items):
-        return {"TOKEN": "function_decl", "identifier": items[1], "parameters": items[2], "body": items[3]}
+        return FunctionDecl(items[1], items[2], items[3])
     func_block = passthrough
     
     def class_decl(self, items):
-        return {"TOKEN": "class_decl", "identifier": items[1], "parameters": items[2], "body": items[3]}
+        return named(ClassDecl(sys.intern(items[1].value), items[2], items[3:]), items[1])
     method = function_decl
     
     # line of code
     def module_statement(self, items):
-        return {"TOKEN": "module_statement", "path": items[1]}
+        return ModuleStatement(items[1])
     def import_statement(self, items):
-        return {"TOKEN": "import_statement", "path": items[1]}
+        return ImportStatement(items[1])
 
     def statement(self, items):
-        return {"TOKEN": "statement", "body": items[0]}
+        return Statement(items[0])
     statement_content = firstitem
     
     def declaration(self, items):
-        return {"TOKEN": "declaration", "varword": items[0], "identifier": items[1], "body": items[2] or None}
+        return Declaration(items[0], items[1], items[2] or None)
     declaration_contents = passthrough
     def typed_decl(self, items):
-        return {"TOKEN": "declaration_body", "type": items[0], "value": None}
+        return DeclarationBody(items[0], None)
     def valued_decl(self, items):
-        return {"TOKEN": "declaration_body", "type": None, "value": items[0]}
+        return DeclarationBody(None, items[0])
     def typed_valued_decl(self, items):
-        return {"TOKEN": "declaration_body", "type": items[0], "value": items[1]}
+        return DeclarationBody(items[0], items[1])
     
     def definition(self, items):
-        return {"TOKEN": "definition", "identifier": items[0], "value": items[1]}
+        return Definition(items[0], items[1])
     def reassignment(self, items):
-        return {"TOKEN": "reassignment", "identifier": items[0], "operator": items[1], "value": items[2]}
+        return Reassignment(items[0], items[1], items[2])
     def unary_reassignment(self, items):
-        return {"TOKEN": "unary_reassignment", "identifier": items[0], "operator": items[1]}
+        return UnaryReassignment(items[0], items[1])
     
     def throw_statement(self, items):
-        return {"TOKEN": "throw_statement", "body": items[1]}
+        return ThrowStatement(items[1])
     
     def return_statement(self, items):
-        return {"TOKEN": "return_statement", "value": items[1]}
+        return ReturnStatement(items[1])
     
     # expressions
     expression_list = passthrough
-    
-    def expression(self, items):
-        return items[0]
-    
     definition_expression = firstitem
     
     def function_invocation(self, items):
-        return {"TOKEN": "function_invocation", "function": items[0], "args": items[1], "handler": items[2] or None}
+        return FunctionInvocation(items[0], items[1], items[2] or None)
     handler = firstitem
     def catcher(self, items):
-        return {"TOKEN": "catcher", "identifier": items[1], "body": items[2]}
+        return Catcher(items[1], items[2])
     def array_getter(self, items):
-        return {"TOKEN": "array_getter", "identifier": items[0], "expression": items[1] }
+        return ArrayGetter(items[0], items[1])
     def map_getter(self, items):
         if items[2] == None:
-            return {"TOKEN": "map_getter", "identifier": items[0], "Key": items[1] }
+            return MapGetter(items[0], items[1])
         else:
-            return {"TOKEN": "method_call", "identifier": items[0], "Key": items[1], "arguments": items[2] }
+            return MethodCall(items[0], items[1], items[2])
             
     def typed_expression(self, items):
-        return {"TOKEN": "typed_expression", "type": items[0], "value": items[1]}
+        return TypedExpression(items[0], items[1])
     def unary_expression(self, items):
-        return {"TOKEN": "unary_expression", "Operator": items[0], "rhs": items[1]}
-    def math_expression(self, items):
-        return {"TOKEN": "math_expression", "lhs": items[0], "Operator": items[1], "rhs": items[2]}
-    def bitwise_expression(self, items):
-        return {"TOKEN": "bitwise_expression", "lhs": items[0], "Operator": items[1], "rhs": items[2]}
-    def logical_expression(self, items):
-        return {"TOKEN": "logical_expression", "lhs": items[0], "Operator": items[1], "rhs": items[2]}
-    def comparison_expression(self, items):
-        return {"TOKEN": "comparison_expression", "lhs": items[0], "Operator": items[1], "rhs": items[2]}
+        return UnaryExpression(items[0], items[1])
+    def operation(self, items):
+        # operands and operators alternate; operators of a higher tier are grouped first, then those of a tier from the left
+        operands = [items[0]]
+        operators = []
+        def reduce():
+            rhs = operands.pop()
+            op = operators.pop()
+            operands.append(BINARY_NODES[op](operands.pop(), op, rhs))
+        for i in range(1, len(items), 2):
+            while operators and OPERATOR_TIERS[operators[-1]] >= OPERATOR_TIERS[items[i]]:
+                reduce()
+            operators.append(items[i])
+            operands.append(items[i + 1])
+        while operators:
+            reduce()
+        return operands[0]
+    def power(self, items):
+        return BINARY_NODES['^'](items[0], items[1], items[2])
     
     func_expression = passthrough
     def function_expression(self, items):
-        return {"TOKEN": "function_expression", "parameters": items[1], "body": items[2]}
+        return FunctionExpression(items[1], items[2])
     def lambda_expression(self, items):
-        return {"TOKEN": "lambda_expression", "parameters": items[1], "body": items[2]}
+        return LambdaExpression(items[1], items[2])
     
     def parenth_expression(self, items):
         return items[0]
@@ -160,31 +249,30 @@ class ASTTransformer(Transformer):
     # basic elements
     params_list = passthrough
     def function_param(self, items):
-        return {"TOKEN": "function_param", "Identifier": items[0], "Type": items[1]}
+        return named(FunctionParam(sys.intern(items[0].value), items[1]), items[0])
     def args_list(self, items):
         return items
     def map_key(self, items):
         return items[0]
     def variable_identifier(self, items):
-        return {"TOKEN": "identifier", "Name": extract_chars(items)}
+        return named(Identifier(sys.intern(extract_chars(items))), items[1])
     def type_list(self, items):
         return items
 
     # atomics
     def identifier(self, items):
-        return extract_chars(items)
+        return sys.intern(items[0].value)
 
     def number(self, items):
-        return {"TOKEN": "number", "value": items[0]}
+        return Number(items[0])
     def based_number(self, items):
         [value, base] = items[0].split('_')
-        return {"TOKEN": "based_number", "Base": base, "Value": value}
+        return BasedNumber(base, value)
     def numeral(self, items):
         return extract_chars(items)
-    digit = firstitem
     
     def string(self, items):
-        return extract_chars(items)
+        return unescape(items[0])
     
     def boolean(self, items):
         return items[0] == "true"
@@ -195,28 +283,28 @@ class ASTTransformer(Transformer):
     def array(self, items):
         indices = [item for i, item in enumerate(items) if i % 2 == 0]
         values = [item for i, item in enumerate(items) if i % 2 == 1]
-        return {"TOKEN": "array", "indices": indices, "values": values}
+        return Array(indices, values)
     
     def map(self, items):
         keys = [item for i, item in enumerate(items) if i % 2 == 0]
         values = [item for i, item in enumerate(items) if i % 2 == 1]
-        return {"TOKEN": "map", "keys": keys, "values": values}
+        return Map(keys, values)
     
     def range(self, items):
-        return {"TOKEN": "range", "start": items[0], "end": items[1]}
+        return Range(items[0], items[1])
     
     def type_value(self, items):
-        return extract_chars(items[0])
+        if isinstance(items[0], Token):
+            return sys.intern(unescape(items[0]))
+        return items[0]
     def lit_type(self, items):
-        return {"TOKEN": "lit_type", "type": items[0]}
+        return LitType(items[0])
     
     # operators
     reassignment_op = firstitem
     unary_reassignment_op = firstitem
     unary_op = firstitem
-    bitwise_op = firstitem
-    logical_op = firstitem
-    comparison_op = firstitem
+    binary_op = firstitem
     
     # symbols
     def sym_positive(self, items): return "+"
@@ -263,11 +351,96 @@ class ASTTransformer(Transformer):
     def sym_nullable(self, item): return "?"
     def sym_errorable(self, item): return "!"
 
+# Create parser that builds the AST during parsing, without an intermediate tree
+ast_parser = build_parser(grammar, cache=USE_CACHE, transformer=ASTTransformer())
+
 def parse(code):
     """Parse a code string"""
-    tree = parser.parse(code)
-    ast = ASTTransformer().transform(tree)
-    return ast
+    return ast_parser.parse(code)
 
-def get_parser():
-    return parser
+class ParseError(Exception):
+    """A Lark parse error detached from its parser, so it can be sent between processes."""
+
+    def __init__(self, message, line=None, column=None, pos_in_stream=None):
+        super().__init__(message, line, column, pos_in_stream)
+        self.line = line
+        self.column = column
+        self.pos_in_stream = pos_in_stream
+
+    def __str__(self):
+        return self.args[0]
+
+def detached_error(error, start=0, line=1, column=1):
+    """ParseError of a Lark error raised parsing part of a source, which starts at an offset, line and column of it"""
+    if isinstance(error, lark.exceptions.UnexpectedToken):
+        error.token = Token.new_borrow_pos(error.token.type, error.token.value, error.token)
+        positions = [error, error.token]
+    else:
+        positions = [error]
+    for item in positions:
+        # lines and columns are 1-based, and columns only shift on the first line of the part
+        if getattr(item, 'line', -1) not in (-1, None):
+            if item.line == 1:
+                item.column += column - 1
+            item.line += line - 1
+        for field in ('pos_in_stream', 'start_pos'):
+            if getattr(item, field, None) not in (-1, None):
+                setattr(item, field, getattr(item, field) + start)
+    return ParseError(f"{type(error).__name__}: {error}", error.line, error.column, error.pos_in_stream)
+
+# what a scan for unit boundaries looks at: brackets and semicolons, and the strings and comments that may hide them
+BOUNDARY_TOKEN = re.compile(r"""[{}()\[\];] | //[^\n]* | /\* | "(?:[^"\\]|\\\s*\S)*" | `(?:[^`\\]|\\\s*\S)*`""", re.X)
+SPACE = re.compile(r"(?:\s+|//[^\n]*)*")
+WORD = re.compile(r"[A-Za-z_]\w*")
+# words that continue the unit before them, or must stay with the imports before them
+JOINED_WORDS = frozenset(['else', 'import', 'module'])
+
+def unit_boundaries(code, start=0, last_close=None):
+    """Yield the offsets after `start` where a top-level unit of a code string ends and the next begins, then its end.
+
+    Boundaries follow a `;` or `}` outside any brackets, strings or comments, and precede a token that starts a unit
+    and cannot continue the one before it, so the code between two boundaries parses on its own to whole units.
+    Block comments end at `last_close`, the last */ of the code, as the grammar's comment pattern is greedy.
+    """
+    if last_close is None:
+        last_close = code.rfind('*/')
+    depth = 0
+    pos = start
+    while True:
+        match = BOUNDARY_TOKEN.search(code, pos)
+        if match is None:
+            break
+        token = match.group()
+        pos = match.end()
+        if token == '/*':
+            if last_close >= pos:
+                pos = last_close + 2
+            continue
+        if token in '{([':
+            depth += 1
+        elif token in '})]':
+            depth -= 1
+        if depth != 0 or token not in ';}':
+            continue
+        boundary = pos
+        # look at the next token, skipping comments
+        pos = SPACE.match(code, pos).end()
+        while code.startswith('/*', pos) and last_close >= pos + 2:
+            pos = SPACE.match(code, last_close + 2).end()
+        word = WORD.match(code, pos)
+        if word:
+            if word.group() not in JOINED_WORDS:
+                yield boundary
+        elif code.startswith(('{', '#'), pos) or (token == ';' and code.startswith(';', pos)):
+            yield boundary
+        pos = boundary
+    yield len(code)
+
+def parse_tree(code):
+    """Parse a code string into a Lark tree, without building the AST (for debugging)"""
+    return get_parser().parse(code)
+
+def generate_standalone(out):
+    """Write a standalone Python module of the parser, which does not need Lark installed."""
+    from lark.tools.standalone import gen_standalone
+    gen_standalone(get_parser(), out=out)
@@ -0,0 +1,189 @@
+"""Per-stage profiling of the Nouva pipeline.
+
+A `Profile` is passed as the `stats` option of the Transpiler, `transpile()` or `compile()`.
+Without one, the pipeline runs uninstrumented: the stages only check for a collector once per run.
+With one, the code is parsed in separately timed lex, parse and transform stages instead of the fused parse,
+and the emitter is driven by an instrumented copy of `Transpiler.transpile_part`.
+"""
+import json
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from types import GeneratorType
+
+from lark.visitors import Transformer_NonRecursive
+
+from nodes import Node
+from parser import get_parser, ASTTransformer
+
+def node_name(item):
+    """Name of an AST item in the statistics: the TOKEN of a node, or the Python type of anything else"""
+    return item.TOKEN if isinstance(item, Node) else type(item).__name__
+
+class Profile:
+    """Collects wall time per stage, token, rule and node counts, emitter time per node type and output size."""
+
+    def __init__(self):
+        self.stages = defaultdict(float) # seconds per stage
+        self.tokens = Counter() # lexed tokens per terminal
+        self.rules = Counter() # parse tree nodes per grammar rule
+        self.nodes = Counter() # AST nodes per TOKEN
+        self.emit_seconds = defaultdict(float) # emitter time per node type, excluding children
+        self.emit_counts = Counter()
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.peak_memory_bytes = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage, adding to the time of earlier runs"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def parse(self, code):
+        """Parse a code string into an AST in separately timed stages.
+
+        Lark builds the scanner of each lexer state on first use, so the first parse of a process lexes slower.
+        """
+        self.input_bytes += len(code.encode('utf-8'))
+        clock = time.perf_counter
+        interactive = get_parser().parse_interactive(code)
+        tokens = interactive.lexer_thread.lex(interactive.parser_state)
+        # the contextual lexer depends on the parser state, so lexing and parsing alternate token by token
+        lex = parse = 0.0
+        last = None
+        while True:
+            start = clock()
+            token = next(tokens, None)
+            lexed = clock()
+            lex += lexed - start
+            if token is None:
+                break
+            interactive.feed_token(token)
+            parse += clock() - lexed
+            self.tokens[token.type] += 1
+            last = token
+        start = clock()
+        tree = interactive.feed_eof(last)
+        self.stages['lex'] += lex
+        self.stages['parse'] += parse + clock() - start
+
+        for subtree in tree.iter_subtrees():
+            self.rules[str(subtree.data)] += 1
+        with self.stage('transform'):
+            ast = Transformer_NonRecursive.transform(ASTTransformer(), tree)
+        self.count_nodes(ast)
+        return ast
+
+    def count_nodes(self, ast):
+        stack = [ast]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Node):
+                self.nodes[item.TOKEN] += 1
+                stack.extend(getattr(item, field) for field in item.__slots__)
+            elif isinstance(item, list):
+                stack.extend(item)
+
+    def transpile_part(self, transpiler, item):
+        """Transpile an AST item like `Transpiler.transpile_part`, timing the handler of each node type"""
+        clock = time.perf_counter
+        seconds = self.emit_seconds
+        counts = self.emit_counts
+        stack = [] # (generator, name) of the handlers in progress
+        last = clock()
+
+        def visit(child):
+            """Run the handler of a child, returning its code or None once its generator is pushed"""
+            nonlocal last
+            name = node_name(child)
+            counts[name] += 1
+            now = clock()
+            if stack:
+                seconds[stack[-1][1]] += now - last
+            last = now
+            result = transpiler.visit(child)
+            if type(result) is GeneratorType:
+                stack.append((result, name))
+                return None
+            now = clock()
+            seconds[name] += now - last
+            last = now
+            return result
+
+        code = visit(item)
+        if not stack:
+            return code
+        while True:
+            generator, name = stack[-1]
+            try:
+                child = generator.send(code)
+            except StopIteration as done:
+                now = clock()
+                seconds[name] += now - last
+                last = now
+                stack.pop()
+                code = done.value
+                if not stack:
+                    return code
+                continue
+            code = child if child.__class__ is str else visit(child)
+
+    def measure_memory(self, func):
+        """Record the peak memory traced while running a function, returning its result.
+
+        Tracing slows everything down, so run it separately from the timed run.
+        """
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            return func()
+        finally:
+            self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+
+    def to_dict(self):
+        emit = {name: {'count': self.emit_counts[name], 'seconds': seconds}
+                for name, seconds in sorted(self.emit_seconds.items(), key=lambda entry: -entry[1])}
+        return {
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'total_seconds': sum(self.stages.values()),
+            'stages': dict(self.stages),
+            'tokens': dict(self.tokens.most_common()),
+            'rules': dict(self.rules.most_common()),
+            'nodes': dict(self.nodes.most_common()),
+            'emit': emit,
+        }
+
+    def write_json(self, out):
+        json.dump(self.to_dict(), out, indent=2)
+        out.write('\n')
+
+    def write_report(self, out, top=10):
+        """Write a human-readable report, listing the `top` entries of each count"""
+        total = sum(self.stages.values()) or 1
+        lines = [f"input {self.input_bytes} bytes, output {self.output_bytes} bytes"]
+        if self.peak_memory_bytes is not None:
+            lines.append(f"peak memory {self.peak_memory_bytes / 1024:.1f} KiB")
+        lines.append("stages:")
+        for name, seconds in self.stages.items():
+            lines.append(f"  {name:<12} {seconds * 1000:10.3f} ms {seconds / total:7.1%}")
+        lines.append(f"  {'total':<12} {sum(self.stages.values()) * 1000:10.3f} ms")
+        for title, counts in (("tokens", self.tokens), ("rules", self.rules), ("nodes", self.nodes)):
+            if counts:
+                lines.append(f"{title}: {sum(counts.values())} total")
+                lines += [f"  {name:<24} {count:8}" for name, count in counts.most_common(top)]
+        if self.emit_seconds:
+            lines.append("emit time by node type:")
+            for name, seconds in sorted(self.emit_seconds.items(), key=lambda entry: -entry[1])[:top]:
+                lines.append(f"  {name:<24} {self.emit_counts[name]:8} {seconds * 1000:10.3f} ms")
+        out.write('\n'.join(lines) + '\n')
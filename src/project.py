@@ -0,0 +1,282 @@
+"""Builds of multi-file Nouva projects.
+
+A build starts from an entry file and follows the `import` statements of each module, resolving a dotted path such
+as `util.strings` to `util/strings.nv` under the first root that has it. Each module is compiled on its own in a
+worker process as soon as it is found, so the modules it imports are found and compiled alongside it. The checks a
+module makes are recorded and replayed once the names its imports declare are known, and its imports and exports
+are added around its code when the build is put together, dependencies first. The modules of a bundle share its
+scope, so two of them cannot declare the same top-level name, even a private one, and a module cannot import the
+same name from two modules.
+
+With the `shake` option, each module of a build of modules drops the private units it does not use, its exports
+being kept. The names of a bundle are shared by all of its modules, so a bundle is shaken as a whole when it is put
+together: its modules keep the code of each of their top-level units apart, with the graph of the names they use.
+"""
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from lark.exceptions import UnexpectedInput
+
+from nodes import Program, Imports, ImportStatement
+from options import BUILD_FORMATS as FORMATS
+from parser import parse, detached_error
+from shaker import declared_name, reachable
+from symbols import Checker, DECLARE, raise_diagnostics, symbol_name
+from transpiler import RecordingTranspiler
+
+MODULE_EXTENSION = '.nv'
+OUTPUT_EXTENSIONS = {'js': '.js', 'ts': '.ts'}
+
+def module_path(name, roots):
+    """Path of the source of a dotted module name under the first root that has it, or None"""
+    for root in roots:
+        path = os.path.join(root, *name.split('.')) + MODULE_EXTENSION
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+def declared_names(units):
+    """Emitted names of the public top-level declarations of a program"""
+    names = []
+    for item in units:
+        name = declared_name(item)
+        if name is not None and not name.startswith('#'):
+            names.append(symbol_name(name))
+    return list(dict.fromkeys(names))
+
+class Parts(list):
+    """Stream keeping its writes apart, each being a top-level unit written by a transpiler"""
+    write = list.append
+
+def compile_module(code, lang, options, split=False):
+    """Compile the source of a module on its own, returning its code, imports, exports and recorded checks.
+
+    With `split`, it is not shaken but returns the code of each top-level unit and their graph, for a bundle.
+    """
+    try:
+        tree = parse(code)
+    except UnexpectedInput as e:
+        raise detached_error(e) from None
+    imports = [str(statement.path) for item in tree.body if isinstance(item, Imports)
+               for statement in item.body if isinstance(statement, ImportStatement)]
+    units = [item for item in tree.body if not isinstance(item, Imports)]
+    exports = declared_names(units)
+    kept = exports
+    if split:
+        # every unit is kept as if exported, leaving the graph made by the check to shake the bundle with
+        options = dict(options, shake=True)
+        kept = [symbol_name(name) for name in map(declared_name, units) if name is not None]
+    transpiler = RecordingTranspiler(target=lang, check=True, exports=kept, **options)
+    parts = Parts()
+    transpiler.transpile_tree_to(Program(units), parts)
+    result = {'imports': list(dict.fromkeys(imports)), 'exports': exports, 'checks': transpiler.checks}
+    if split:
+        result.update(units=parts, graph=transpiler.graph)
+    else:
+        result.update(code=''.join(parts), removed=transpiler.removed)
+    return result
+
+def run_now(func, *args):
+    """A future of a call made in this process"""
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+class Project:
+    """A multi-file project, reusing the compiled modules of earlier builds while their sources do not change.
+
+    Options are those of `compile()`. Modules are compiled across `jobs` worker processes,
+    and also reused from a cache.CompileCache if one is given. When shaking, `removed` lists the names of the
+    top-level units each module dropped in the last build, by path.
+    """
+
+    def __init__(self, roots, lang, format='bundle', jobs=None, cache=None, **options):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format}, expected one of: {', '.join(FORMATS)}")
+        if format == 'bundle' and options.get('minify'):
+            # modules shorten their private names on their own, which could then clash in a bundle
+            raise ValueError("Bundles cannot be minified, build modules instead")
+        self.roots = roots
+        self.lang = lang.lower()
+        self.format = format
+        self.jobs = jobs
+        self.cache = cache
+        self.options = options
+        # modules of a shaken bundle are kept whole, split into their units
+        self.split = format == 'bundle' and bool(options.get('shake'))
+        self.target = '+'.join(['module', self.lang, *(f"{key}={value}" for key, value in sorted(options.items())),
+                                *(['split'] if self.split else [])])
+        self.compiled = {} # (source, result) of each module by path
+        self.removed = {}
+
+    def compiled_module(self, path, code):
+        """Result of compiling a module in an earlier build, or None"""
+        if path in self.compiled and self.compiled[path][0] == code:
+            return self.compiled[path][1]
+        if self.cache:
+            output = self.cache.get(code, self.target)
+            if output is not None:
+                return json.loads(output)
+        return None
+
+    def build(self, entry):
+        """Build the project from an entry file, returning the output of each file by its relative path"""
+        entry = os.path.abspath(entry)
+        names = {entry: None} # dotted names of the modules found, by path
+        imports = {} # paths of the modules imported by each module
+        results = {}
+        queue = [entry]
+        pending = {}
+        pool = None
+        try:
+            while queue or pending:
+                for path in queue:
+                    with open(path, 'r') as f:
+                        code = f.read()
+                    result = self.compiled_module(path, code)
+                    if result is not None:
+                        self.compiled[path] = (code, result)
+                        pending[run_now(lambda: result)] = (path, code)
+                    elif self.jobs == 1:
+                        pending[run_now(compile_module, code, self.lang, self.options, self.split)] = (path, code)
+                    else:
+                        pool = pool or ProcessPoolExecutor(self.jobs)
+                        pending[pool.submit(compile_module, code, self.lang, self.options, self.split)] = (path, code)
+                queue = []
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, code = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        raise Exception(f"{path}: {e}") from e
+                    if self.compiled.get(path, (None,))[0] != code:
+                        self.compiled[path] = (code, result)
+                        if self.cache:
+                            self.cache.put(code, self.target, json.dumps(result))
+                    results[path] = result
+                    imports[path] = []
+                    for name in result['imports']:
+                        dependency = module_path(name, self.roots)
+                        if dependency is None:
+                            raise Exception(f"CompileError: module {name} imported by {path} is not under {', '.join(self.roots)}")
+                        imports[path].append(dependency)
+                        if dependency not in names:
+                            names[dependency] = name
+                            queue.append(dependency)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        order = topological_order(entry, imports, names)
+        for path in order:
+            checker = Checker(name for dependency in imports[path] for name in results[dependency]['exports'])
+            checker.replay(results[path]['checks'])
+            if self.format == 'modules':
+                # a module cannot import the same name from two modules
+                checker.diagnostics += shared_names(imports[path], lambda dependency: results[dependency]['exports'],
+                                                    names, 'imported from')
+            try:
+                checker.raise_errors()
+            except Exception as e:
+                raise Exception(f"{path}: {e}") from e
+        if self.format == 'bundle':
+            raise_diagnostics(shared_names(order, lambda path: [name for kind, name, _ in results[path]['checks']
+                                                                if kind == DECLARE], names, 'declared by'))
+        return self.assemble(entry, order, imports, names, results)
+
+    def output_path(self, path, names):
+        """Relative path of the output of a module"""
+        name = names[path]
+        base = os.path.splitext(os.path.basename(path))[0] if name is None else os.path.join(*name.split('.'))
+        return base + OUTPUT_EXTENSIONS.get(self.lang, '.js')
+
+    def shake_bundle(self, order, results):
+        """Code of each module of a bundle without the top-level units no module reaches, by path"""
+        graph = [entry for path in order for entry in results[path]['graph']]
+        kept = reachable(graph)
+        codes = {}
+        first = 0
+        for path in order:
+            units = results[path]['units']
+            indices = range(first, first + len(units))
+            codes[path] = ''.join(code for i, code in zip(indices, units) if i in kept)
+            removed = [graph[i][0] for i in indices if i not in kept]
+            if removed:
+                self.removed[path] = removed
+            first += len(units)
+        return codes
+
+    def assemble(self, entry, order, imports, names, results):
+        self.removed = {path: results[path]['removed'] for path in order if results[path].get('removed')}
+        if self.format == 'bundle':
+            if self.split:
+                codes = self.shake_bundle(order, results)
+            else:
+                codes = {path: results[path]['code'] for path in order}
+            bundle = ''.join(f"// module {names[path] or os.path.basename(path)}\n{codes[path]}" for path in order)
+            return {self.output_path(entry, names): bundle}
+        outputs = {}
+        for path in order:
+            output_path = self.output_path(path, names)
+            lines = []
+            for dependency in imports[path]:
+                specifier = os.path.relpath(os.path.splitext(self.output_path(dependency, names))[0] + '.js',
+                                            os.path.dirname(output_path) or '.').replace(os.sep, '/')
+                if not specifier.startswith('.'):
+                    specifier = './' + specifier
+                exports = results[dependency]['exports']
+                lines.append(f"import {'{'} {', '.join(exports)} {'}'} from '{specifier}';\n" if exports else f"import '{specifier}';\n")
+            exports = results[path]['exports']
+            if exports:
+                lines.append(f"{results[path]['code']}export {'{'} {', '.join(exports)} {'}'};\n")
+            else:
+                lines.append(results[path]['code'])
+            outputs[output_path] = ''.join(lines)
+        return outputs
+
+def shared_names(paths, declared, names, verb):
+    """Diagnostics of the names that more than one of the modules at the paths declare, given by `declared(path)`"""
+    first = {} # path of the first module declaring each name
+    diagnostics = []
+    for path in paths:
+        for name in declared(path):
+            module = first.setdefault(name, path)
+            if module != path:
+                modules = ' and '.join(names[item] or os.path.basename(item) for item in (module, path))
+                diagnostics.append((None, f"ident {name} is {verb} both {modules}"))
+    return diagnostics
+
+def topological_order(entry, imports, names):
+    """Paths of the modules imported from an entry, each after the modules it imports, raising on cycles"""
+    order = []
+    visiting = {entry}
+    done = set()
+    stack = [(entry, iter(imports[entry]))]
+    while stack:
+        path, dependencies = stack[-1]
+        for dependency in dependencies:
+            if dependency in done:
+                continue
+            if dependency in visiting:
+                cycle = [item for item, _ in stack]
+                cycle = cycle[cycle.index(dependency):] + [dependency]
+                raise Exception("CompileError: import cycle " + ' -> '.join(names[item] or os.path.basename(item) for item in cycle))
+            visiting.add(dependency)
+            stack.append((dependency, iter(imports[dependency])))
+            break
+        else:
+            stack.pop()
+            visiting.discard(path)
+            done.add(path)
+            order.append(path)
+    return order
+
+def build(entry, lang, roots=None, format='bundle', jobs=None, cache=None, **options):
+    """Build a project from an entry file, with imports resolved under the roots (by default the entry's directory)"""
+    roots = roots or [os.path.dirname(os.path.abspath(entry))]
+    return Project(roots, lang, format, jobs, cache, **options).build(entry)
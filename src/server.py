@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import signal
+import statistics
+import struct
+import sys
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import client
+from cli import run_job, COMPILE_OPTIONS, LANG_ERROR
+
+LATENCY_WINDOW = 1000 # recent requests kept per function for latency stats
+
+def warm_up():
+    """Build the parser in a worker before its first job"""
+    import parser
+
+class Server:
+    """Compile daemon answering length-prefixed JSON requests from warm worker processes.
+
+    Requests are `{"func": "parse"|"transpile"|"compile", "code": ..., "lang": ...}`, or `{"func": "stats"}`,
+    where compile requests may also set the options of `compile()` in cli.COMPILE_OPTIONS.
+    Responses are `{"output": ...}` or `{"error": ...}`, with the request latency in `elapsed_ms`.
+    """
+
+    def __init__(self, jobs=None, cache=None, cache_size=None):
+        self.pool = ProcessPoolExecutor(jobs, initializer=warm_up)
+        self.cache = cache
+        self.cache_size = cache_size
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.requests = 0
+
+    def stats(self):
+        stats = {'requests': self.requests, 'latency_ms': {}}
+        for func, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            stats['latency_ms'][func] = {
+                'count': len(ordered),
+                'mean': statistics.fmean(ordered),
+                'p50': ordered[len(ordered) // 2],
+                'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                'max': ordered[-1],
+            }
+        return stats
+
+    async def answer(self, request):
+        if request.get('func') == 'stats':
+            return self.stats()
+        if request.get('func') == 'compile' and not request.get('lang'):
+            return {'error': LANG_ERROR}
+        start = time.perf_counter()
+        job = {'func': request.get('func'), 'code': request.get('code', ''), 'lang': request.get('lang'),
+               'cache': self.cache, 'cache_size': self.cache_size}
+        job.update((key, request[key]) for key in COMPILE_OPTIONS if key in request)
+        result = await asyncio.get_running_loop().run_in_executor(self.pool, run_job, job)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.latencies[job['func']].append(elapsed)
+        response = {key: result[key] for key in ('output', 'error') if key in result}
+        response['elapsed_ms'] = elapsed
+        return response
+
+    async def handle(self, reader, writer):
+        """Answer requests from one client until it disconnects"""
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(4)
+                except asyncio.IncompleteReadError:
+                    break
+                [length] = struct.unpack('>I', header)
+                try:
+                    request = json.loads(await reader.readexactly(length))
+                    if not isinstance(request, dict):
+                        raise TypeError(f"request must be a JSON object, not {type(request).__name__}")
+                    response = await self.answer(request)
+                except (ValueError, TypeError) as e:
+                    response = {'error': f"{type(e).__name__}: {e}"}
+                writer.write(client.encode(response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, address):
+        host, port = client.tcp_address(address)
+        if port is None:
+            if os.path.exists(address):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self.handle, path=address)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving Nouva on {address}", file=sys.stderr)
+        stop = asyncio.get_running_loop().create_future()
+        try:
+            # a signal may come again while the daemon is stopping
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: stop.done() or stop.set_result(None))
+        except NotImplementedError:
+            pass # no signal handlers on Windows, where the daemon stops on Ctrl+C
+        try:
+            async with server:
+                await stop
+        finally:
+            self.pool.shutdown()
+            if port is None and os.path.exists(address):
+                os.unlink(address)
+
+def serve(address=None, jobs=None, cache=None, cache_size=None):
+    """Run the compile daemon until interrupted"""
+    try:
+        asyncio.run(Server(jobs, cache, cache_size).serve(address or client.DEFAULT_ADDRESS))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,91 @@
+"""Tree shaking: dropping the top-level functions, classes and declarations no part of a program uses.
+
+The top-level units of a program form a graph, from each unit to the top-level names it refers to anywhere in its
+body, as resolved through its scopes by symbols.py, so a local name shadowing a top-level one does not keep it.
+The names no scope declares are kept as uses too: those declared by a later unit, and in a bundle, by other modules.
+The walk is that of a check of the program, which a transpiler checking names makes once for both.
+
+The roots of the graph are the units that run code as the program starts: every statement and control block, and
+every declaration whose value calls a function. Functions, classes and the declarations of other values are kept
+only if a root, or the declaration of an exported name, reaches them.
+"""
+from nodes import (Node, Program, Statement, Declaration, FunctionDecl, ClassDecl, FunctionExpression,
+    LambdaExpression, FunctionInvocation, MethodCall)
+from symbols import Analyzer, symbol_name
+
+def declared_name(item):
+    """Source name a top-level unit declares, or None"""
+    if isinstance(item, Statement) and isinstance(item.body, Declaration):
+        return item.body.identifier.Name
+    if isinstance(item, FunctionDecl):
+        return item.identifier.Name
+    if isinstance(item, ClassDecl):
+        return item.identifier
+    return None
+
+# nodes whose evaluation calls a function, and nodes defining functions, whose bodies are not evaluated
+CALLS = frozenset([FunctionInvocation, MethodCall])
+FUNCTIONS = frozenset([FunctionDecl, ClassDecl, FunctionExpression, LambdaExpression])
+
+def calls(body):
+    """Whether evaluating a body calls a function, outside of any function it defines"""
+    stack = [body]
+    while stack:
+        item = stack.pop()
+        cls = type(item)
+        if cls in CALLS:
+            return True
+        if cls is list:
+            stack += item
+        elif cls not in FUNCTIONS and isinstance(item, Node):
+            stack += [getattr(item, field) for field in item.__slots__]
+    return False
+
+def is_root(item):
+    """Whether a top-level unit has to be kept whether or not its name is used"""
+    if isinstance(item, (FunctionDecl, ClassDecl)):
+        return False
+    return not (isinstance(item, Statement) and isinstance(item.body, Declaration)) or calls(item.body.body)
+
+def unit_graph(units, analyzer=None):
+    """(declared name or None, top-level names used, whether it is a root) of each top-level unit of a program.
+
+    The units are walked by an Analyzer, a new one by default, which then indexes the whole program.
+    """
+    analyzer = analyzer or Analyzer()
+    top = analyzer.top.names
+    references = analyzer.index.references
+    graph = []
+    for item in units:
+        first = len(references)
+        analyzer.walk([item])
+        uses = dict.fromkeys(reference.name for reference in references[first:]
+                             if reference.symbol is None or top.get(reference.name) is reference.symbol)
+        name = declared_name(item)
+        graph.append((name and symbol_name(name), list(uses), is_root(item)))
+    return graph
+
+def reachable(graph, exports=()):
+    """Indices of the units of a graph reached from its roots and from the declarations of the exported names"""
+    declaring = {} # indices of the units declaring each name
+    for i, (name, _, _) in enumerate(graph):
+        if name is not None:
+            declaring.setdefault(name, []).append(i)
+    stack = [i for i, (_, _, root) in enumerate(graph) if root]
+    stack += [i for name in exports for i in declaring.get(name, ())]
+    kept = set(stack)
+    while stack:
+        for name in graph[stack.pop()][1]:
+            for i in declaring.get(name, ()):
+                if i not in kept:
+                    kept.add(i)
+                    stack.append(i)
+    return kept
+
+def shake(tree, exports=(), graph=None):
+    """Program without the top-level units nothing reaches, and the names of the units removed"""
+    if graph is None:
+        graph = unit_graph(tree.body)
+    kept = reachable(graph, exports)
+    removed = [graph[i][0] for i in range(len(graph)) if i not in kept]
+    return Program([item for i, item in enumerate(tree.body) if i in kept]), removed
@@ -0,0 +1,168 @@
+"""Snapshots of parsed programs, so a source parsed once can be transpiled or compiled many times.
+
+A snapshot lists the nodes of an AST in breadth-first order, the root first. A field holding a node holds the index
+of that node instead, so the list is flat however deep the tree, and a node's children always come after it.
+Snapshots come in two formats:
+    - json: `{"format": "nouva-ast", "version": 1, "nodes": [...]}`, each node a `{"TOKEN": ..., <field>: ...}` dict
+      as given by `Node.to_dict()`, with the `start` of named nodes; it is written a batch of nodes at a time
+    - binary: a table of the node types and their fields, then each node as a tuple of its type's index and its
+      fields, written with `marshal`; it is smaller and faster to load, but only meant for trusted files
+Names keep their source offsets, so a loaded AST is indexed by symbols.py as the one parsed.
+"""
+import gc
+import io
+import json
+import marshal
+from contextlib import contextmanager
+
+from nodes import NODE_TYPES, Named
+from options import SNAPSHOT_FORMATS as FORMATS
+
+FORMAT_NAME = 'nouva-ast'
+VERSION = 1
+MAGIC = b'NVAST\x01'
+MARSHAL_VERSION = 4
+# nodes per write of a json snapshot
+BATCH_SIZE = 4096
+
+CLASSES = {cls.TOKEN: cls for cls in NODE_TYPES}
+
+def fields(cls):
+    """Fields of a node type as stored in a snapshot"""
+    return (*cls.__slots__, 'start') if issubclass(cls, Named) else cls.__slots__
+
+FIELDS = {cls: fields(cls) for cls in NODE_TYPES}
+
+@contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector, which would rescan the many objects of a tree as they are made"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def records(tree):
+    """Each node of a tree in breadth-first order with the values of its fields, nodes replaced by their index"""
+    queue = [tree]
+    append = queue.append
+    def value(item):
+        if item is None or type(item) is str or type(item) is bool:
+            return item
+        if type(item) is list:
+            return [value(subitem) for subitem in item]
+        if isinstance(item, str):
+            # a token left in the tree
+            return str(item)
+        append(item)
+        return len(queue) - 1
+    for node in queue:
+        values = [value(getattr(node, field)) for field in node.__slots__]
+        if len(FIELDS[type(node)]) > len(values):
+            values.append(getattr(node, 'start', None))
+        yield node, values
+
+def dump_json(tree, stream):
+    """Write a json snapshot of a tree to a text stream"""
+    stream.write(f'{{"format": "{FORMAT_NAME}", "version": {VERSION}, "nodes": [\n')
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    batch = []
+    separator = ''
+    for node, values in records(tree):
+        record = {'TOKEN': node.TOKEN}
+        record.update(zip(FIELDS[type(node)], values))
+        if record.get('start', 0) is None:
+            del record['start']
+        batch.append(record)
+        if len(batch) == BATCH_SIZE:
+            # a batch is encoded at once, one line of nodes
+            stream.write(separator + encode(batch)[1:-1])
+            batch = []
+            separator = ',\n'
+    if batch:
+        stream.write(separator + encode(batch)[1:-1])
+    stream.write('\n]}\n')
+
+def dump_binary(tree, stream):
+    """Write a binary snapshot of a tree to a binary stream"""
+    codes = {cls: i for i, cls in enumerate(NODE_TYPES)}
+    table = [(cls.TOKEN, FIELDS[cls]) for cls in NODE_TYPES]
+    nodes = [(codes[type(node)], *values) for node, values in records(tree)]
+    stream.write(MAGIC)
+    stream.write(marshal.dumps((table, nodes), MARSHAL_VERSION))
+
+def dump(tree, stream, format='json'):
+    """Write a snapshot of a tree to a stream, a text stream for json and a binary one otherwise"""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {format}, expected one of: {', '.join(FORMATS)}")
+    with paused_gc():
+        if format == 'json':
+            dump_json(tree, stream)
+        else:
+            dump_binary(tree, stream)
+
+def dumps(tree, format='json'):
+    """Snapshot of a tree, a string for json and bytes otherwise"""
+    buffer = io.StringIO() if format == 'json' else io.BytesIO()
+    dump(tree, buffer, format)
+    return buffer.getvalue()
+
+def build(types, nodes):
+    """Tree of snapshot nodes given as (node type, [field values]), building each node after its children"""
+    built = [None] * len(nodes)
+    def value(item):
+        if type(item) is int:
+            return built[item]
+        if type(item) is list:
+            return [value(subitem) for subitem in item]
+        return item
+    for i in range(len(nodes) - 1, -1, -1):
+        cls, values = types[i], nodes[i]
+        node = cls.__new__(cls)
+        for field, item in zip(cls.__slots__, values):
+            setattr(node, field, value(item))
+        if len(values) > len(cls.__slots__) and values[-1] is not None:
+            node.start = values[-1]
+        built[i] = node
+    return built[0] if built else None
+
+def load_json(data):
+    snapshot = json.loads(data)
+    if not isinstance(snapshot, dict) or snapshot.get('format') != FORMAT_NAME:
+        raise ValueError("Not a Nouva AST snapshot")
+    if snapshot.get('version') != VERSION:
+        raise ValueError(f"Unsupported snapshot version {snapshot.get('version')}, expected {VERSION}")
+    types = []
+    nodes = []
+    for record in snapshot['nodes']:
+        cls = CLASSES.get(record.get('TOKEN'))
+        if cls is None:
+            raise ValueError(f"Unknown node type {record.get('TOKEN')} in snapshot")
+        types.append(cls)
+        nodes.append([record.get(field) for field in FIELDS[cls]])
+    return build(types, nodes)
+
+def load_binary(data):
+    table, nodes = marshal.loads(memoryview(data)[len(MAGIC):])
+    classes = []
+    for token, names in table:
+        cls = CLASSES.get(token)
+        if cls is None or FIELDS[cls] != tuple(names):
+            raise ValueError(f"Node type {token} of the snapshot does not match this version of the AST")
+        classes.append(cls)
+    return build([classes[node[0]] for node in nodes], [node[1:] for node in nodes])
+
+def loads(data):
+    """Tree of a snapshot given as a string or bytes, of either format"""
+    with paused_gc():
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            if bytes(data[:len(MAGIC)]) == MAGIC:
+                return load_binary(data)
+            data = bytes(data).decode('utf-8')
+        return load_json(data)
+
+def load(stream):
+    """Tree of a snapshot read from a text or binary stream, of either format"""
+    return loads(stream.read())
@@ -0,0 +1,322 @@
+"""Scoped symbol tables of compiled programs, and their index of definitions and references.
+
+`analyze()` walks an AST once with hashed scopes: one for the top level, and one for each block, function, class,
+catch, loop and switch case. A declaration adds its name to the innermost scope, reporting a name that scope already
+declares, and pushes its symbol on the stack of the symbols visible under that name, which is popped once the walk
+leaves the scope. Every other use of a name is looked up on the top of its stack, in one step however deep the scope,
+reporting assignments to a name no scope declares. Every diagnostic of a run is collected, in source order.
+
+Names are declared in source order, after the value they are declared with, so `var x = x;` reads an outer `x`.
+Functions and classes are declared before their bodies, which can then refer to them. Names are compared as
+emitted, so `#x` is `_x`, and `x?` and `x!` are `x`.
+
+The resulting `SymbolIndex` keeps the definition and every reference of each name by source offset, for
+go-to-definition and find-references. A part of a program transpiled on its own is analyzed with its top level left
+open: the top-level declarations and the assignments no scope of the part resolves are kept as checks, in order,
+to be replayed by a `Checker` once the names declared before the part are known.
+"""
+from bisect import bisect_right
+
+from nodes import (Node, Program, Block, ForBlock, SwitchCase, SwitchDefault, FunctionDecl, ClassDecl, Declaration,
+    Definition, Reassignment, UnaryReassignment, Catcher, FunctionExpression, LambdaExpression, Identifier, Number,
+    BasedNumber, LitType)
+
+# kinds of recorded checks
+DECLARE = 'declare'
+ASSIGN = 'assign'
+ERROR = 'error'
+
+# item pushed under the items of a scope, leaving the scope once they are walked
+LEAVE = object()
+
+def symbol_name(name):
+    """Name of the symbol an identifier refers to, as emitted"""
+    return name.replace('#', '_').replace('?', '').replace('!', '')
+
+def name_length(name):
+    """Length of the name token of an identifier"""
+    return len(name) - name.count('#') - name.count('?') - name.count('!')
+
+class Symbol:
+    """A declared name; `kind` is 'var', 'val', 'func', 'class', 'param', 'for', or 'import' for names declared by
+    imported modules, which have no position."""
+    __slots__ = ('name', 'kind', 'start', 'end', 'references')
+
+    def __init__(self, name, kind, start, end):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.references = []
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.kind!r}, {self.start})"
+
+class Reference:
+    """A use of a name, which `assigns` it or reads it; `symbol` is None if no scope declares the name."""
+    __slots__ = ('name', 'start', 'end', 'assigns', 'symbol')
+
+    def __init__(self, name, start, end, assigns):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.assigns = assigns
+        self.symbol = None
+
+    def __repr__(self):
+        return f"Reference({self.name!r}, {self.start}, {self.symbol!r})"
+
+class Scope:
+    __slots__ = ('names',)
+
+    def __init__(self):
+        self.names = {} # Symbol by name
+
+class SymbolIndex:
+    """Symbols, references and diagnostics of an analyzed program, in source order.
+
+    Diagnostics are (start, message) pairs. With an open top level, `checks` records its declarations and
+    assignments, and the diagnostics of the inner scopes, to be replayed by a Checker.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.references = []
+        self.diagnostics = []
+        self.checks = [] # (kind, name or message, start)
+        self.spans = None
+
+    def span_index(self):
+        if self.spans is None:
+            spans = [(item.start, item.end, item if isinstance(item, Symbol) else item.symbol)
+                     for items in (self.symbols, self.references) for item in items if item.start is not None]
+            spans.sort(key=lambda span: span[0])
+            self.spans = [span[0] for span in spans], spans
+        return self.spans
+
+    def symbol_at(self, offset):
+        """Symbol whose name is declared or used at an offset, or None"""
+        starts, spans = self.span_index()
+        i = bisect_right(starts, offset) - 1
+        if i >= 0 and offset < spans[i][1]:
+            return spans[i][2]
+        return None
+
+    def references_at(self, offset):
+        """References to the symbol whose name is declared or used at an offset"""
+        symbol = self.symbol_at(offset)
+        return list(symbol.references) if symbol else []
+
+class Analyzer:
+    """Walks the parts of a program through their scopes, filling a SymbolIndex.
+
+    With `open` set, the top level is left to be checked by a Checker; `names` are declared beforehand.
+    """
+
+    def __init__(self, open=False, names=()):
+        self.index = SymbolIndex()
+        self.open = open
+        self.top = Scope()
+        self.visible = {} # stack of the symbols of the open scopes by name, innermost last
+        self.names = {}
+        for name in names:
+            self.add(self.top, Symbol(name, 'import', None, None))
+
+    def report(self, start, message):
+        self.index.diagnostics.append((start, message))
+        if self.open:
+            self.index.checks.append((ERROR, message, start))
+
+    def add(self, scope, symbol):
+        scope.names[symbol.name] = symbol
+        self.visible.setdefault(symbol.name, []).append(symbol)
+
+    def enter(self, stack):
+        """New scope, left once the items pushed after it are walked"""
+        scope = Scope()
+        stack.append((LEAVE, scope))
+        return scope
+
+    def leave(self, scope):
+        for name in scope.names:
+            self.visible[name].pop()
+
+    def name(self, name):
+        """Symbol name and token length of an identifier"""
+        entry = self.names.get(name)
+        if entry is None:
+            entry = self.names[name] = (symbol_name(name), name_length(name))
+        return entry
+
+    def declare(self, scope, name, kind, start, offset):
+        name, length = self.name(name)
+        if start is not None:
+            start += offset
+        symbol = Symbol(name, kind, start, None if start is None else start + length)
+        self.index.symbols.append(symbol)
+        if self.open and scope is self.top:
+            self.index.checks.append((DECLARE, name, start))
+            if name not in scope.names:
+                self.add(scope, symbol)
+        elif name in scope.names:
+            self.report(start, f"ident {name} already exists")
+        else:
+            self.add(scope, symbol)
+
+    def use(self, identifier, scope, offset, assigns=False):
+        name, length = self.name(identifier.Name)
+        start = getattr(identifier, 'start', None)
+        if start is not None:
+            start += offset
+        reference = Reference(name, start, None if start is None else start + length, assigns)
+        self.index.references.append(reference)
+        symbols = self.visible.get(name)
+        if symbols:
+            symbol = reference.symbol = symbols[-1]
+            symbol.references.append(reference)
+        elif assigns:
+            if self.open:
+                self.index.checks.append((ASSIGN, name, start))
+            else:
+                self.report(start, f"ident {name} is not defined")
+
+    def declare_parameters(self, scope, parameters, offset):
+        for param in parameters:
+            self.declare(scope, param.Identifier, 'param', getattr(param, 'start', None), offset)
+
+    def walk(self, tree, offset=0):
+        """Analyze a program, or a list of top-level units, starting at an offset of the source"""
+        # items are pushed in reverse so they are visited in source order; a (name, kind, start) tuple is declared
+        # when it is reached, after the items pushed before it, and a scope is left when its LEAVE item is reached
+        stack = [(tree, self.top)]
+        pop = stack.pop
+        while stack:
+            item, scope = pop()
+            cls = type(item)
+            if cls is list:
+                stack += [(subitem, scope) for subitem in reversed(item) if type(subitem) not in LEAVES]
+            elif cls is tuple:
+                self.declare(scope, *item, offset)
+            elif item is LEAVE:
+                self.leave(scope)
+            elif cls in VISITORS:
+                VISITORS[cls](self, item, scope, offset, stack)
+            elif isinstance(item, Node):
+                stack += [(value, scope) for field in reversed(item.__slots__)
+                          if type(value := getattr(item, field)) not in LEAVES]
+        return self.index
+
+    # node visitors, dispatched on the node class by VISITORS; other nodes are walked field by field
+    def visit_program(self, item, scope, offset, stack):
+        stack.append((item.body, scope))
+
+    def visit_identifier(self, item, scope, offset, stack):
+        self.use(item, scope, offset)
+
+    def visit_declaration(self, item, scope, offset, stack):
+        identifier = item.identifier
+        stack += [((identifier.Name, item.varword, getattr(identifier, 'start', None)), scope), (item.body, scope)]
+
+    def visit_definition(self, item, scope, offset, stack):
+        self.use(item.identifier, scope, offset, assigns=True)
+        stack.append((item.value, scope))
+
+    def visit_unary_reassignment(self, item, scope, offset, stack):
+        self.use(item.identifier, scope, offset, assigns=True)
+
+    def visit_function_decl(self, item, scope, offset, stack):
+        identifier = item.identifier
+        self.declare(scope, identifier.Name, 'func', getattr(identifier, 'start', None), offset)
+        self.visit_function_expression(item, scope, offset, stack)
+
+    def visit_function_expression(self, item, scope, offset, stack):
+        inner = self.enter(stack)
+        self.declare_parameters(inner, item.parameters, offset)
+        stack.append((item.body, inner))
+
+    def visit_class_decl(self, item, scope, offset, stack):
+        # parameters become fields, which share the scope of the class members
+        self.declare(scope, item.identifier, 'class', getattr(item, 'start', None), offset)
+        self.visit_function_expression(item, scope, offset, stack)
+
+    def visit_catcher(self, item, scope, offset, stack):
+        inner = self.enter(stack)
+        self.declare_parameters(inner, [item.identifier], offset)
+        stack.append((item.body, inner))
+
+    def visit_for_block(self, item, scope, offset, stack):
+        inner = self.enter(stack)
+        stack += [(item.body, inner), ((item.identifier, 'for', getattr(item, 'start', None)), inner),
+                  (item.range, scope)]
+
+    def visit_block(self, item, scope, offset, stack):
+        inner = self.enter(stack)
+        stack.append((item.body, inner))
+
+    def visit_switch_case(self, item, scope, offset, stack):
+        # a case body is a block of its own, unless it is a single expression
+        inner = self.enter(stack) if type(item.body) is list else scope
+        stack.append((item.body, inner))
+        if type(item) is SwitchCase:
+            stack.append((item.cases, scope))
+
+# types of the items that cannot hold a name; tokens and other leaves are skipped once reached
+LEAVES = frozenset([str, type(None), Number, BasedNumber, LitType])
+VISITORS = {
+    Program: Analyzer.visit_program,
+    Identifier: Analyzer.visit_identifier,
+    Declaration: Analyzer.visit_declaration,
+    Definition: Analyzer.visit_definition,
+    Reassignment: Analyzer.visit_definition,
+    UnaryReassignment: Analyzer.visit_unary_reassignment,
+    FunctionDecl: Analyzer.visit_function_decl,
+    FunctionExpression: Analyzer.visit_function_expression,
+    LambdaExpression: Analyzer.visit_function_expression,
+    ClassDecl: Analyzer.visit_class_decl,
+    Catcher: Analyzer.visit_catcher,
+    ForBlock: Analyzer.visit_for_block,
+    Block: Analyzer.visit_block,
+    SwitchCase: Analyzer.visit_switch_case,
+    SwitchDefault: Analyzer.visit_switch_case,
+}
+
+def analyze(tree, open=False, names=()):
+    """Analyze the scopes of a program, returning its SymbolIndex; see Analyzer for the options"""
+    return Analyzer(open, names).walk(tree)
+
+def raise_diagnostics(diagnostics):
+    """Raise (start, message) diagnostics, if any, as a single compile error listing them in source order"""
+    if diagnostics:
+        diagnostics = sorted(diagnostics, key=lambda diagnostic: -1 if diagnostic[0] is None else diagnostic[0])
+        raise Exception('\n'.join(f"CompileError: {message}" for _, message in diagnostics))
+
+class Checker:
+    """Top-level names of a program checked in parts, and the diagnostics of the checks replayed so far.
+
+    A program is a flat list of top-level units, so it can be split at the boundaries found by
+    `parser.unit_boundaries` into parts that each parse on their own to the units a full parse would give. Replaying
+    the checks recorded for each part, in source order, gives the diagnostics of a check of the whole program, which
+    is how editor documents and parallel transpilation check their chunks.
+    """
+
+    def __init__(self, names=()):
+        self.names = set(names)
+        self.diagnostics = []
+
+    def replay(self, checks, offset=0):
+        """Replay the recorded checks of a part starting at an offset of the program"""
+        for kind, value, start in checks:
+            if start is not None:
+                start += offset
+            if kind == DECLARE:
+                if value in self.names:
+                    self.diagnostics.append((start, f"ident {value} already exists"))
+                self.names.add(value)
+            elif kind == ASSIGN:
+                if value not in self.names:
+                    self.diagnostics.append((start, f"ident {value} is not defined"))
+            else:
+                self.diagnostics.append((start, value))
+
+    def raise_errors(self):
+        raise_diagnostics(self.diagnostics)
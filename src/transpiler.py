@@ -1,285 +1,512 @@
-import re
+import io
+from contextlib import nullcontext
+from types import GeneratorType
+from nodes import (NODE_TYPES, Node, FunctionInvocation, Catcher, ReturnStatement, FunctionDecl, ClassDecl,
+    FunctionExpression, LambdaExpression, UnaryExpression, Number, BINARY_NODES)
+from minifier import shorten_identifiers, minify_code
+from optimizer import fold_constants
 from parser import parse
+from shaker import shake, unit_graph
+from symbols import Analyzer, raise_diagnostics
 
-use_compiler = False
-declared_vars = []
-errors = []
+# ways of lowering error handlers and range loops
+# - closure: wrap handled invocations in a function and call the handler as a function, re-evaluating loop ends
+# - inline: emit handled invocation statements as try/catch with the catch body inline, and evaluate loop ends once;
+#   it also counts open ranges from 0 or without end, and drops the ! of throwing functions from their declarations
+LOWERINGS = ('closure', 'inline')
 
-_UNIQDELIM = "ab467d4984e596ba" # arbitrary ID used to delimit intermediate transpilations that require reparsing in a parent token
-def intermediary_pack(values):
-    return _UNIQDELIM.join(values)
-def intermediary_unpack(str):
-    return str.split(_UNIQDELIM)
+# the kinds of target-specific code kept by each target language
+MARKER_KINDS = {
+    'js': ('JS', 'ES'),
+    'ts': ('TS', 'ES'),
+}
 
-def transpile_part(item):
-    # quick exceptions for fundamental JS types
-    if item == None:
-        return 'undefined'
-    if item == True or item == False:
-        return str(item).lower()
-    # basic type checks
-    if isinstance(item, str):
-        return item
-    if isinstance(item, list):
-        js = ''
-        for subitem in item:
-            js += transpile_part(subitem)
-        return js
-    
-    def collect(key):
-        return transpile_part(item[key])
+# JavaScript precedence of emitted expressions, with binary expressions by their Nouva operator
+BINARY_PRECEDENCE = {
+    '^': 13, # **
+    '*': 12, '/': 12,
+    '+': 11, '-': 11,
+    '<<': 10, '>>': 10,
+    '<': 9, '<=': 9, '>': 9, '>=': 9,
+    '==': 8, '!=': 8,
+    '&': 7,
+    '><': 6, # ^
+    '|': 5,
+    '&&': 4,
+    '||': 3,
+}
+UNARY_PRECEDENCE = 14
+ARROW_PRECEDENCE = 2
+PRIMARY_PRECEDENCE = 18
+BINARY_TYPES = tuple(set(BINARY_NODES.values()))
 
-    # parse token
-    """Note: naming format of keys:
-        - Constants: UPPERCASE
-        - Collated strings: Capitalised
-        - Subtokens: lowercase
-       Ensure sync with parser.py
-    """
-    match item["TOKEN"]:
-        
-        # blocks of code
-        case 'block':
-            return '{\n' + collect("body") + '}'
-        case 'function_decl':
-            ident = collect("identifier")
-            params = []
-            for param_item in item["parameters"]:
-                params.append(transpile_part(param_item))
-            param_list = ','.join(params)
-            body = collect("body")
-            
-            if use_compiler:
-                if ident in declared_vars:
-                    raise f"CompileError: ident {ident} already exists"
-                declared_vars.append(ident)
-            
-            return f"function {ident}({param_list}) {'{'}\n{body}{'}'}\n"
-        case 'if_block':
-            expr = collect("test")
-            iftrue = collect("iftrue")
-            iffalse = item["iffalse"] and collect("iffalse")
-            if iffalse:
-                return f"if ({expr}) {iftrue} else {iffalse}"
-            else:
-                return f"if ({expr}) {iftrue}"
-        case 'else_block':
-            return collect("body")
-        case 'while_block':
-            expr = collect("test")
-            body = collect("body")
-            return f"while ({expr}) {body}"
-        case 'for_block':
-            ident = collect("identifier")
-            minv = transpile_part(item["range"]["start"])
-            maxv = transpile_part(item["range"]["end"])
-            body = collect("body")
-            return f"for (let {ident} = {minv}; {ident} <= {maxv}; {ident}++) {body}"
-        case 'switch_block':
-            expr = collect("expression")
-            body = collect("body")
-            return f"switch ({expr}) {'{'}\n{body}\n{'}'}"
-        case 'switch_case':
-            cases_label = ''
-            for case_val in item["cases"]:
-                cases_label += 'case ' + transpile_part(case_val) + ': '
-            body = collect("body")
-            return f"{cases_label} {'{'}\n{body} break;\n{'}'}"
-        case 'switch_default':
-            return f"default: {'{'}\n{collect("body")} break;\n{'}'}"
-        case 'class_decl':
-            ident = collect("identifier")
-            params = []
-            param_idents = []
-            for param_item in item["parameters"]:
-                params.append(transpile_part(param_item))
-                param_idents.append(param_item["Identifier"])
-            body = collect("body")
-            
-            # create constructor
-            constructor_body = ''
-            for param in param_idents:
-                constructor_body += f"this.{param} = {param};\n"
-            full_body = f"constructor({','.join(params)}) {'{'} {constructor_body} {'}'}\n" + body
-            
-            if use_compiler:
-                if ident in declared_vars:
-                    raise f"CompileError: ident {ident} already exists"
-                declared_vars.append(ident)
-            
-            return f"class {ident} {'{'}\n{full_body}{'}'}\n"
-        
-        # line of code
-        case 'statement':
-            return collect("body") + ';\n'
-        case 'declaration':
-            var_keyword = collect("varword")
-            ident = collect("identifier")
-            [value, type_val] = intermediary_unpack(collect("body")) # NOTE: collects from packed intermediary result
-            varword = ''
-            match var_keyword:
-                case 'var': varword = '/*ES/let/*/'
-                case 'val': varword = '/*ES/const/*/'
-                
-            if use_compiler:
-                if ident in declared_vars:
-                    raise f"CompileError: ident {ident} already exists"
-                declared_vars.append(ident)
-                
-            return f"{varword} {ident} {type_val and f"/*TS/: {type_val}/*/" or ''} = {value}"
-        # NOTE: returns packed intermediary result (must be unpacked)
-        case 'declaration_body':
-            value = collect("value")
-            types = item["type"]
-            type_idents = []
-            for type_item in types or []:
-                type_idents.append(transpile_part(type_item))
-            type_val = '|'.join(type_idents)
-            return intermediary_pack([value, type_val])
-        case 'definition':
-            ident = collect("identifier")
-            value = collect("value")
-            
-            if use_compiler:
-                if not ident in declared_vars:
-                    raise Exception(f"CompileError: ident {ident} is not defined")
-            
-            return f"{ident} = {value}"
-        case 'reassignment':
-            ident = collect("identifier")
-            operator = collect("operator")
-            value = collect("value")
-            
-            if use_compiler:
-                if not ident in declared_vars:
-                    raise Exception(f"CompileError: ident {ident} is not defined")
-            
-            return f"{ident} {operator} {value}"
-        case 'unary_reassignment':
-            ident = collect("identifier")
-            operator = collect("operator")
-            js_operation = ''
-            match operator:
-                case '=!=': js_operation = '=!' + ident
-                
-            if use_compiler:
-                if not ident in declared_vars:
-                    raise Exception(f"CompileError: ident {ident} is not defined")
-            
-            return f"{ident} {js_operation}"
-        
-        case 'throw_statement':
-            body = collect("body")
-            return f"throw {body}"
+def precedence(item):
+    """JavaScript precedence of the code emitted for an expression"""
+    if isinstance(item, list) and len(item) == 1:
+        item = item[0] # function expressions
+    if isinstance(item, BINARY_TYPES):
+        return BINARY_PRECEDENCE[item.Operator]
+    if isinstance(item, UnaryExpression) or (isinstance(item, Number) and str(item.value).startswith('-')):
+        return UNARY_PRECEDENCE
+    if isinstance(item, LambdaExpression):
+        return ARROW_PRECEDENCE
+    return PRIMARY_PRECEDENCE
 
-        case 'return_statement':
-            value = collect("value")
-            return f"return {value};\n"
+class Transpiler:
+    """Transpiles Nouva code to JavaScript, holding all state of a single run.
+    
+    Options:
+        - target: language to emit ('js', 'ts'), or None to emit target-specific code as marker comments
+        - check: whether to report compile errors for undeclared or redeclared identifiers
+        - optimize: whether to fold constant expressions and branches before emitting (see optimizer.py)
+        - lowering: how to lower error handlers and range loops, one of LOWERINGS
+        - minify: whether to shorten local identifiers and emit compact code, all at once (see minifier.py)
+        - shake: whether to drop the top-level functions, classes and declarations nothing uses (see shaker.py)
+        - exports: emitted names kept when shaking, as used from outside the program
+        - stats: a profiler.Profile collecting timings and counts of each stage, or None
+    A new run starts on every call, but an instance must not be shared between threads mid-run.
+    """
+    
+    def __init__(self, target=None, check=False, optimize=False, lowering='closure', minify=False, shake=False, exports=(),
+                 stats=None):
+        if lowering not in LOWERINGS:
+            raise ValueError(f"Unknown lowering {lowering}, expected one of: {', '.join(LOWERINGS)}")
+        self.target = target
+        self.check = check
+        self.optimize = optimize
+        self.inline = lowering == 'inline'
+        self.minify = minify
+        self.shake = shake
+        self.exports = exports
+        self.stats = stats
+        self.symbols = None # symbols.SymbolIndex of the last program checked
+        self.graph = None # shaker.unit_graph() of the last program checked when shaking
+        self.removed = [] # names of the top-level units the last run dropped when shaking
+        self.marker_kinds = target is not None and MARKER_KINDS.get(target.lower(), ())
+    
+    def marked(self, kind, code):
+        """Emit code specific to a kind of target ('JS', 'TS' or 'ES' for both)"""
+        if self.target is None:
+            return f"/*{kind}/{code}/*/"
+        return code if kind in self.marker_kinds else ''
+    
+    def declaration_parts(self, body):
+        """Transpile the value and type union of a declaration body"""
+        if body is None:
+            return 'undefined', ''
+        [body] = body
+        value = yield body.value
+        type_val = '|'.join((yield from self.each(body.type or [])))
+        return value, type_val
+    
+    def transpile_part(self, item):
+        """Transpile an AST item to code.
         
-        # expressions
-        case 'function_invocation':
-            name = collect("function").replace('!', '').replace('?', '').replace('#', '')
-            args = collect("args")
-            handler = item["handler"] and collect("handler")
-            if handler:
-                return f"(function() {'{'}\ntry {'{'}\nreturn {name}({args});\n{'}'} catch(_e$) {'{'}\n({handler})(_e$);\n{'}'}\n{'}'})()"
+        Handlers of nodes with children are generators that yield each child and are sent back its code.
+        They are driven from an explicit stack, so nesting depth is not limited by the Python stack.
+        """
+        result = self.visit(item)
+        if type(result) is not GeneratorType:
+            return result
+        visit = self.visit
+        handlers = HANDLERS
+        stack = [result]
+        send = result.send
+        code = None
+        while True:
+            try:
+                child = send(code)
+            except StopIteration as done:
+                stack.pop()
+                code = done.value
+                if not stack:
+                    return code
+                send = stack[-1].send
+                continue
+            if child.__class__ is str:
+                code = child
+                continue
+            handler = handlers.get(child.__class__)
+            result = handler(self, child) if handler else visit(child)
+            if type(result) is GeneratorType:
+                stack.append(result)
+                send = result.send
+                code = None
             else:
-                return f"{name}({args})"
-        case 'catcher':
-            ident = collect("identifier")
-            body = collect("body")
-            return f"(function({ident}) {'{'}\n{body}\n{'}'})"
-        case 'method_call':
-            ident = collect("identifier")
-            key = item["Key"]
-            args = collect("arguments")
-            return f"{ident}.{key}({args})"
+                code = result
+    
+    def visit(self, item):
+        """Transpile a leaf item, or return the generator transpiling a node or list"""
+        handler = HANDLERS.get(item.__class__)
+        if handler:
+            return handler(self, item)
+        # quick exceptions for fundamental JS types
+        if item is None:
+            return 'undefined'
+        if item is True or item is False:
+            return str(item).lower()
+        # basic type checks
+        if isinstance(item, str):
+            return item
+        if isinstance(item, list):
+            return self.emit_list(item)
+        return self.emit_unknown(item)
+    
+    def each(self, items):
+        """Transpile each of a list of items, returning their code as a list"""
+        codes = []
+        for subitem in items:
+            codes.append((yield subitem))
+        return codes
+    
+    def emit_list(self, items):
+        return ''.join((yield from self.each(items)))
+    
+    def analyze_names(self, parse_tree, analyzer):
+        """Analyze the scopes of a program into `symbols`, and its top-level units into `graph` when shaking"""
+        if self.shake:
+            self.graph = unit_graph(parse_tree.body, analyzer)
+        else:
+            analyzer.walk(parse_tree)
+        self.symbols = analyzer.index
+    
+    def check_names(self, parse_tree):
+        """Analyze the scopes of a program, raising all of its diagnostics at once"""
+        self.analyze_names(parse_tree, Analyzer())
+        raise_diagnostics(self.symbols.diagnostics)
+    
+    # node handlers, dispatched on the node class by HANDLERS
+    
+    # blocks of code
+    def emit_block(self, item):
+        return '{\n' + (yield item.body) + '}'
+    
+    def emit_function_decl(self, item):
+        ident = yield item.identifier
+        if self.inline:
+            # the ! of functions that throw is not part of their JavaScript name, as in emit_function_invocation
+            ident = ident.replace('!', '')
+        param_list = ','.join((yield from self.each(item.parameters)))
+        body = yield item.body
+        return f"function {ident}({param_list}) {'{'}\n{body}{'}'}\n"
+    
+    def emit_if_block(self, item):
+        expr = yield item.test
+        iftrue = yield item.iftrue
+        iffalse = item.iffalse and (yield item.iffalse)
+        if iffalse:
+            return f"if ({expr}) {iftrue} else {iffalse}"
+        else:
+            return f"if ({expr}) {iftrue}"
+    
+    def emit_else_block(self, item):
+        return (yield item.body)
+    
+    def emit_while_block(self, item):
+        expr = yield item.test
+        body = yield item.body
+        return f"while ({expr}) {body}"
+    
+    def emit_for_block(self, item):
+        ident = yield item.identifier
+        start, end = item.range.start, item.range.end
+        if self.inline:
+            # an open range counts from 0 or without end
+            minv = '0' if start is None else (yield start)
+            maxv = None if end is None else (yield end)
+        else:
+            minv = yield start
+            maxv = yield end
+        body = yield item.body
+        if maxv is None:
+            return f"for (let {ident} = {minv}; ; {ident}++) {body}"
+        if self.inline and not maxv.isdigit():
+            return f"for (let {ident} = {minv}, {ident}$end = {maxv}; {ident} <= {ident}$end; {ident}++) {body}"
+        return f"for (let {ident} = {minv}; {ident} <= {maxv}; {ident}++) {body}"
+    
+    def emit_switch_block(self, item):
+        expr = yield item.expression
+        body = yield item.body
+        return f"switch ({expr}) {'{'}\n{body}\n{'}'}"
+    
+    def emit_switch_case(self, item):
+        cases_label = ''.join(['case ' + case_val + ': ' for case_val in (yield from self.each(item.cases))])
+        body = yield item.body
+        return f"{cases_label} {'{'}\n{body} break;\n{'}'}"
+    
+    def emit_switch_default(self, item):
+        body = yield item.body
+        return f"default: {'{'}\n{body} break;\n{'}'}"
+    
+    def emit_class_decl(self, item):
+        ident = yield item.identifier
+        params = yield from self.each(item.parameters)
+        param_idents = [param_item.Identifier for param_item in item.parameters]
+        body = yield item.body
         
-        case 'unary_expression':
-            op = item["Operator"]
-            rhs = transpile_part(item["rhs"])
-            return f"{op} {rhs}"
-        case 'math_expression' | 'bitwise_expression' | 'logical_expression' | 'comparison_expression':
-            lhs = transpile_part(item["lhs"])
-            op = item["Operator"]
-            rhs = transpile_part(item["rhs"])
-            # Nouva->JS conversions
-            if op == '^': op = '**'
-            elif op == '^=': op = '**='
-            elif op == '><': op = '^'
-            elif op == '><=': op = '^='
-            
-            return f"{lhs} {op} {rhs}"
+        # create constructor
+        constructor_body = ''.join([f"this.{param} = {param};\n" for param in param_idents])
+        full_body = f"constructor({','.join(params)}) {'{'} {constructor_body} {'}'}\n" + body
         
-        case 'lambda_expression':
-            params = []
-            for param_item in item["parameters"]:
-                params.append(transpile_part(param_item))
-            param_list = ','.join(params)
-            body = collect("body")
-            return f"({param_list}) => {body}"
+        return f"class {ident} {'{'}\n{full_body}{'}'}\n"
+    
+    # line of code
+    def emit_statement(self, item):
+        if self.inline and type(item.body) is FunctionInvocation and item.body.handler is not None:
+            return (yield from self.emit_handled_statement(item.body))
+        return (yield item.body) + ';\n'
+    
+    def emit_handled_statement(self, item):
+        """Emit an invocation with an error handler in statement position as try/catch"""
+        name = (yield item.function).replace('!', '').replace('?', '').replace('#', '')
+        args = yield item.args
+        handler = item.handler
+        if type(handler) is Catcher and not contains_return(handler.body):
+            body = yield handler.body
+            return f"try {'{'}\n{name}({args});\n{'}'} catch ({handler.identifier.Identifier}) {'{'}\n{body}\n{'}'}\n"
+        handler = yield handler
+        return f"try {'{'}\n{name}({args});\n{'}'} catch (_e$) {'{'}\n({handler})(_e$);\n{'}'}\n"
+    
+    def emit_declaration(self, item):
+        var_keyword = yield item.varword
+        ident = yield item.identifier
+        value, type_val = yield from self.declaration_parts(item.body)
+        varword = ''
+        match var_keyword:
+            case 'var': varword = self.marked('ES', 'let')
+            case 'val': varword = self.marked('ES', 'const')
         
-        # basic elements:
-        case 'function_param':
-            ident = item["Identifier"]
-            type_union = '|'.join(item["Type"])
-            return f"{ident} /*TS/: {type_union}/*/"
+        return f"{varword} {ident} {type_val and self.marked('TS', f': {type_val}')} = {value}"
+    
+    def emit_definition(self, item):
+        ident = yield item.identifier
+        value = yield item.value
+        return f"{ident} = {value}"
+    
+    def emit_reassignment(self, item):
+        ident = yield item.identifier
+        operator = yield item.operator
+        value = yield item.value
+        return f"{ident} {operator} {value}"
+    
+    def emit_unary_reassignment(self, item):
+        ident = yield item.identifier
+        operator = yield item.operator
+        js_operation = ''
+        match operator:
+            case '=!=': js_operation = '=!' + ident
         
-        # atomics:
-        case 'identifier':
-            ident = item["Name"]
-            js_ident = ident.replace('#', '_').replace('?', '')
-            return js_ident
-        case 'number':
-            return transpile_part(item["value"])
-        case 'based_number':
-            base = int(item["Base"])
-            num = item["Value"]
-            if base == 2: return '0b' + num
-            if base == 8: return '0o' + num
-            if base == 16: return '0x' + num
-            # for any other base:
-            try:
-                return int(num, base)
-            except:
-                # final fallback
-                # TODO support decimals of arbitrary bases
-                return f"parseInt('{num}', {base})"
+        return f"{ident} {js_operation}"
+    
+    def emit_throw_statement(self, item):
+        body = yield item.body
+        return f"throw {body}"
+    
+    def emit_return_statement(self, item):
+        value = yield item.value
+        return f"return {value};\n"
+    
+    # expressions
+    def emit_function_invocation(self, item):
+        name = (yield item.function).replace('!', '').replace('?', '').replace('#', '')
+        args = yield item.args
+        handler = item.handler and (yield item.handler)
+        if handler:
+            return f"(function() {'{'}\ntry {'{'}\nreturn {name}({args});\n{'}'} catch(_e$) {'{'}\n({handler})(_e$);\n{'}'}\n{'}'})()"
+        else:
+            return f"{name}({args})"
+    
+    def emit_catcher(self, item):
+        ident = yield item.identifier
+        body = yield item.body
+        return f"(function({ident}) {'{'}\n{body}\n{'}'})"
+    
+    def emit_method_call(self, item):
+        ident = yield item.identifier
+        key = item.Key
+        args = yield item.arguments
+        return f"{ident}.{key}({args})"
+    
+    def emit_unary_expression(self, item):
+        op = item.Operator
+        rhs = yield item.rhs
+        # ** binds tighter, but JavaScript still requires its operand of a unary operator to be parenthesized
+        if precedence(item.rhs) < UNARY_PRECEDENCE:
+            rhs = f"({rhs})"
+        return f"{op} {rhs}"
+    
+    def emit_binary_expression(self, item):
+        op = item.Operator
+        # operands are parenthesized where JavaScript would group them differently from the AST
+        tier = BINARY_PRECEDENCE[op]
+        lhs = yield item.lhs
+        # the base of ** cannot be a unary expression in JavaScript, and ** groups from the right
+        if precedence(item.lhs) < tier or (op == '^' and precedence(item.lhs) <= UNARY_PRECEDENCE):
+            lhs = f"({lhs})"
+        rhs = yield item.rhs
+        if precedence(item.rhs) < tier or (op != '^' and precedence(item.rhs) == tier):
+            rhs = f"({rhs})"
+        # Nouva->JS conversions
+        if op == '^': op = '**'
+        elif op == '^=': op = '**='
+        elif op == '><': op = '^'
+        elif op == '><=': op = '^='
         
-        # default
-        case _: return f'/* error {item} */'
+        return f"{lhs} {op} {rhs}"
+    emit_math_expression = emit_bitwise_expression = emit_logical_expression = emit_comparison_expression = emit_binary_expression
+    
+    def emit_lambda_expression(self, item):
+        param_list = ','.join((yield from self.each(item.parameters)))
+        body = yield item.body
+        return f"({param_list}) => {body}"
+    
+    # basic elements
+    def emit_function_param(self, item):
+        ident = item.Identifier
+        type_union = '|'.join(item.Type)
+        return f"{ident} {self.marked('TS', f': {type_union}')}"
+    
+    # atomics
+    def emit_identifier(self, item):
+        return item.Name.replace('#', '_').replace('?', '')
+    
+    def emit_number(self, item):
+        return (yield item.value)
+    
+    def emit_based_number(self, item):
+        base = int(item.Base)
+        num = item.Value
+        if base == 2: return '0b' + num
+        if base == 8: return '0o' + num
+        if base == 16: return '0x' + num
+        # for any other base:
+        try:
+            return str(int(num, base))
+        except:
+            # final fallback
+            # TODO support decimals of arbitrary bases
+            return f"parseInt('{num}', {base})"
+    
+    # default
+    def emit_unknown(self, item):
+        return f'/* error {item} */'
 
-def run_transpiler(code):
-    """Transpile a Nouva code string to JavaScript"""
-    parse_tree = parse(code)
+    def stage(self, name):
+        """Context timing a stage of the run when collecting stats"""
+        return self.stats.stage(name) if self.stats else nullcontext()
     
-    global declared_vars
-    declared_vars = []
+    def transpile_to(self, code, stream):
+        """Transpile a Nouva code string, writing each top-level unit to a stream as it is produced"""
+        self.transpile_tree_to(self.stats.parse(code) if self.stats else parse(code), stream)
     
-    js = ''
-    for item in parse_tree["body"]:
-        js += transpile_part(item)
-    return js
+    def transpile_tree_to(self, parse_tree, stream):
+        """Transpile a parsed program, writing each top-level unit to a stream as it is produced"""
+        stats = self.stats
+        transpile_part = self.transpile_part
+        if stats:
+            transpile_part = lambda item: stats.transpile_part(self, item)
+        if self.optimize:
+            with self.stage('optimize'):
+                parse_tree = fold_constants(parse_tree)
+        self.graph = None
+        if self.check:
+            with self.stage('check'):
+                self.check_names(parse_tree)
+        if self.shake:
+            with self.stage('shake'):
+                parse_tree, self.removed = shake(parse_tree, self.exports, self.graph)
+        if self.minify:
+            with self.stage('shorten'):
+                shorten_identifiers(parse_tree)
+            with self.stage('emit'):
+                code = ''.join(transpile_part(item) for item in parse_tree.body)
+            with self.stage('minify'):
+                code = minify_code(code)
+            units = [code]
+        else:
+            units = (transpile_part(item) for item in parse_tree.body)
+        with self.stage('emit'):
+            for code in units:
+                if stats:
+                    stats.output_bytes += len(code.encode('utf-8'))
+                stream.write(code)
+    
+    def transpile(self, code):
+        """Transpile a Nouva code string"""
+        buffer = io.StringIO()
+        self.transpile_to(code, buffer)
+        return buffer.getvalue()
 
-def transpile(code):
-    global use_compiler
-    use_compiler = False
+class RecordingTranspiler(Transpiler):
+    """Transpiler recording its checks instead of making them, for parts of a program transpiled separately.
+    
+    The recorded checks are replayed by a symbols.Checker once the names declared before the part are known.
+    """
+    
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.checks = [] # (kind, name or message, start), see symbols.py
     
-    return run_transpiler(code)
+    def check_names(self, parse_tree):
+        self.analyze_names(parse_tree, Analyzer(open=True))
+        self.checks = self.symbols.checks
+
+def contains_return(body):
+    """Whether a body returns from its enclosing function, outside of any nested function"""
+    stack = [body]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, ReturnStatement):
+            return True
+        if isinstance(item, (FunctionDecl, ClassDecl, FunctionExpression, LambdaExpression)):
+            continue
+        if isinstance(item, Node):
+            stack.extend(getattr(item, field) for field in item.__slots__)
+        elif isinstance(item, list):
+            stack.extend(item)
+    return False
+
+# node handlers of the Transpiler by node class
+HANDLERS = {cls: getattr(Transpiler, 'emit_' + cls.TOKEN, Transpiler.emit_unknown) for cls in NODE_TYPES}
+
+def transpile_to(code, stream, cache=None, stats=None):
+    """Transpile a Nouva code string, writing the JavaScript to a stream as it is produced"""
+    if cache and not stats:
+        stream.write(transpile(code, cache))
+        return
+    Transpiler(stats=stats).transpile_to(code, stream)
+
+def compile_to(code, lang, stream, cache=None, **options):
+    """Compile a Nouva code string to a language, writing the output to a stream as it is produced.
+    
+    Options are those of the Transpiler: optimize, lowering, minify, shake, exports and stats.
+    A run collecting stats always compiles, bypassing the cache.
+    """
+    if cache and not options.get('stats'):
+        stream.write(compile(code, lang, cache, **options))
+        return
+    Transpiler(target=lang, check=True, **options).transpile_to(code, stream)
+
+def compile_targets(code, langs=('js', 'ts'), optimize=False, **options):
+    """Compile a Nouva code string to several languages from a single parse"""
+    parse_tree = parse(code)
+    if optimize:
+        parse_tree = fold_constants(parse_tree)
+    outputs = {}
+    for lang in langs:
+        buffer = io.StringIO()
+        Transpiler(target=lang, check=True, **options).transpile_tree_to(parse_tree, buffer)
+        outputs[lang] = buffer.getvalue()
+    return outputs
+
+def transpile(code, cache=None, stats=None):
+    if cache and not stats:
+        return cache.fetch(code, 'transpile', lambda: transpile(code))
+    return Transpiler(stats=stats).transpile(code)
 
-def compile(code, lang):
-    global use_compiler
-    use_compiler = True
-    
-    result = run_transpiler(code)
-    
-    match lang.lower():
-        case 'js':
-            # output JS-only or ES features
-            result = re.sub(r"\/\*(?:JS|ES)\/(.+?)\/\*\/", r'\1', result)
-        case 'ts':
-            # output TS-only or ES features
-            result = re.sub(r"\/\*(?:TS|ES)\/(.+?)\/\*\/", r'\1', result)
-    result = re.sub(r"\/\*.+?\/\*\/", '', result)
-    
-    return result
+def compile(code, lang, cache=None, **options):
+    if cache and not options.get('stats'):
+        # outputs of each set of options are cached separately
+        target = '+'.join([lang.lower(), *(f"{key}={value}" for key, value in sorted(options.items()))])
+        return cache.fetch(code, target, lambda: compile(code, lang, **options))
+    return Transpiler(target=lang, check=True, **options).transpile(code)
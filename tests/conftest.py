@@ -0,0 +1,6 @@
+import os
+import sys
+
+root = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, os.path.join(root, 'src'))
+sys.path.insert(0, os.path.join(root, 'bench'))
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+import cli
+
+def test_start_imports():
+    # a single compile neither builds the tree parser nor imports the modules of the other subcommands
+    code = """
+import sys
+import cli, parser
+cli.run('compile', 'var x = 1;', 'js')
+print(parser.tree_parser is None, *(name in sys.modules for name in ('cache', 'profiler', 'project', 'parallel', 'snapshot', 'multiprocessing')))
+"""
+    output = subprocess.run([sys.executable, '-c', code], cwd=cli.os.path.dirname(cli.__file__),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['True'] + ['False'] * 6
@@ -0,0 +1,23 @@
+"""Transpile and compile calls running at once on many threads give the output of the same calls run serially."""
+from concurrent.futures import ThreadPoolExecutor
+
+import corpus
+from transpiler import transpile, compile
+
+def calls():
+    """(function, args, options) of transpile and compile calls on programs of every corpus shape"""
+    for shape in corpus.SHAPES:
+        for size in (1, 8):
+            code = corpus.generate(shape, size)
+            yield transpile, (code,), {}
+            for lang in ('js', 'ts'):
+                yield compile, (code, lang), {}
+                yield compile, (code, lang), {'optimize': True, 'lowering': 'inline'}
+                yield compile, (code, lang), {'minify': True, 'shake': True}
+
+def test_concurrent_outputs_match_serial():
+    jobs = list(calls()) * 8
+    serial = [func(*args, **options) for func, args, options in jobs]
+    with ThreadPoolExecutor(16) as pool:
+        concurrent = list(pool.map(lambda job: job[0](*job[1], **job[2]), jobs))
+    assert concurrent == serial
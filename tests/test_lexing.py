@@ -0,0 +1,38 @@
+"""Whole-token lexing gives the tokens the character-by-character grammar gave for the examples of syntax.md.
+
+`syntax_tokens.json` holds the names, literals and operators of the AST of each code block and inline example
+(bare, as `x = ...;` and as `var x = ...;`) as parsed before whole tokens, in source order, or null where it did not
+parse. Entries with a `note` differ on purpose and keep their `old` tokens.
+"""
+import json
+import os
+
+import pytest
+
+from parser import parse
+
+with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'syntax_tokens.json'), encoding='utf-8') as f:
+    EXAMPLES = json.load(f)
+
+def tokens(tree):
+    """Leaf values of an AST dict in source order"""
+    values = []
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack += [value for key, value in reversed(item.items()) if key != 'TOKEN']
+        elif isinstance(item, list):
+            stack += reversed(item)
+        elif item is not None:
+            values.append(item if isinstance(item, (bool, int, float)) else str(item))
+    return values
+
+@pytest.mark.parametrize('example', EXAMPLES, ids=lambda example: example['source'][:40])
+def test_syntax_example_tokens(example):
+    try:
+        tree = parse(example['source'])
+    except Exception:
+        assert example['tokens'] is None
+        return
+    assert tokens(tree.to_dict()) == example['tokens']
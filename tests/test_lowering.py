@@ -0,0 +1,26 @@
+import pytest
+
+from transpiler import compile
+
+# output of the default closure lowering, unchanged by the inline lowering
+CLOSURE = {
+    "for i : 1.. { print(i); }": "for (let i = 1; i <= undefined; i++) {\nprint(i);\n}",
+    "for i : ..3 { print(i); }": "for (let i = undefined; i <= 3; i++) {\nprint(i);\n}",
+    "for i : 2..n { print(i); }": "for (let i = 2; i <= n; i++) {\nprint(i);\n}",
+    "func f!(a: number) { panic(a); }": "function f!(a ) {\npanic(a);\n}\n",
+}
+
+INLINE = {
+    "for i : 1.. { print(i); }": "for (let i = 1; ; i++) {\nprint(i);\n}",
+    "for i : ..3 { print(i); }": "for (let i = 0; i <= 3; i++) {\nprint(i);\n}",
+    "for i : 2..n { print(i); }": "for (let i = 2, i$end = n; i <= i$end; i++) {\nprint(i);\n}",
+    "func f!(a: number) { panic(a); }": "function f(a ) {\npanic(a);\n}\n",
+}
+
+@pytest.mark.parametrize('source, output', CLOSURE.items())
+def test_closure(source, output):
+    assert compile(source, 'js') == compile(source, 'js', lowering='closure') == output
+
+@pytest.mark.parametrize('source, output', INLINE.items())
+def test_inline(source, output):
+    assert compile(source, 'js', lowering='inline') == output
@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+import corpus
+from parser import parse
+from transpiler import Transpiler
+
+DEPTH = 20000
+
+def blocks(depth):
+    """Nested ifs in a function, each declaring a name from the one declared by the enclosing if"""
+    code = "func nested(v: number) {\n"
+    for i in range(depth):
+        code += f"if v > {i} {{\nvar v{i} = {f'v{i - 1}' if i else 'v'} + 1;\n"
+    return code + f"print(v{depth - 1});\n" + "}\n" * depth + "}\nnested(1);\n"
+
+def ladder(depth):
+    return "var x = 1;\n" + " else ".join(f"if x == {i} {{\nx = {i};\n}}" for i in range(depth)) + "\n"
+
+def lambdas(depth):
+    return "val f = " + "func (z: number) => " * depth + "z;\nprint(f(1));\n"
+
+# programs nested DEPTH levels deep, with a token of their output and how many times it occurs
+PROGRAMS = {
+    # the nested expression cycles through six operators
+    'expression': (corpus.nesting(DEPTH) + "print(nested);\n", ' + ', len(range(0, DEPTH, 6))),
+    'blocks': (blocks(DEPTH), 'if (', DEPTH),
+    'ladder': (ladder(DEPTH), 'if (', DEPTH),
+    'lambdas': (lambdas(DEPTH), '=>', DEPTH),
+}
+
+def emit(tree, **options):
+    out = io.StringIO()
+    Transpiler(**options).transpile_tree_to(tree, out)
+    return out.getvalue()
+
+@pytest.mark.parametrize('name', PROGRAMS)
+def test_deep_nesting(name):
+    code, token, count = PROGRAMS[name]
+    tree = parse(code)
+    tree.to_dict()
+    assert emit(tree).count(token) == count
+    assert emit(tree, target='js', check=True).count(token) == count
+    assert emit(tree, target='ts', check=True, shake=True).count(token) == count
+    # last, as folding and renaming change the tree in place
+    assert emit(tree, target='js', check=True, optimize=True, minify=True)
@@ -0,0 +1,87 @@
+import shutil
+import subprocess
+from fractions import Fraction
+
+import pytest
+
+from transpiler import compile
+
+NODE = shutil.which('node')
+pytestmark = pytest.mark.skipif(NODE is None, reason="node is not installed")
+
+# printed as console.log shows numbers, so that -0 stays distinct from 0
+PRELUDE = "const print = value => console.log(Object.is(value, -0) ? '-0' : String(value));\n"
+
+# expressions evaluated with and without the optimizer
+EXPRESSIONS = [
+    # signed zeros
+    "-0", "0 * -1", "-(0)", "-0 + 0", "1 / -0", "-0 == 0",
+    # division by zero and non-finite results
+    "1 / 0", "-1 / 0", "0 / 0", "(1 / 0) - (1 / 0)", "1 / 0 > 2 ^ 53",
+    # powers
+    "2 ^ 0.5", "2 ^ -1", "2 ^ 10", "2 ^ 53", "2 ^ 53 + 1", "2 ^ 64", "10 ^ 21", "0.1 ^ 3", "-2 ^ 2", "(-2) ^ 3",
+    "2 ^ 3 ^ 2", "(5 + 2 ^ 6) / 4",
+    # based numbers
+    "101_2", "17_8", "4f_16", "zz_36", "12_10", "17_8 + 4f_16 * 101_2", "-4f_16",
+    # arithmetic and bitwise operators
+    "0.1 + 0.2", "1 - -1", "7 - 2 - 1", "8 / 2 / 2", "~5", "7 >< 3", "-8 >> 1", "1 << 33", "1 << 31",
+    "5 & 3 | 8", "2 ^ 32 | 0", "1 + 2 == 3", "1 == 1.0", "2 < 3 == true", "null == 0", "null == null",
+    # logical operators
+    "!0", "!1 && 2", "0 || 0 && 1", "true && 3", "0 && 1 / 0", "null || -0", "false || null",
+]
+
+# side effects of the operands of && and ||, recorded in `calls`
+SHORT_CIRCUIT = """
+var calls = 0;
+func f(n: number) {
+    calls = calls * 10 + n;
+    return n;
+}
+print(0 && f(1));
+print(1 && f(2));
+print(0 || f(3));
+print(4 || f(5));
+print(f(0) || f(6));
+print(f(7) && 0 && f(8));
+print(false && print(9));
+print(true || print(9));
+print(calls);
+"""
+
+def run_node(code):
+    return subprocess.run([NODE, '-e', PRELUDE + code], capture_output=True, text=True, check=True).stdout.splitlines()
+
+def outputs(program):
+    return run_node(compile(program, 'js')), run_node(compile(program, 'js', optimize=True))
+
+def test_expressions():
+    plain, optimized = outputs(''.join(f"print({expression});\n" for expression in EXPRESSIONS))
+    assert list(zip(EXPRESSIONS, optimized)) == list(zip(EXPRESSIONS, plain))
+
+def test_short_circuit():
+    plain, optimized = outputs(SHORT_CIRCUIT)
+    assert optimized == plain
+    assert plain[-1] == '23067'
+
+def test_constant_branches():
+    program = """
+if 1 > 2 {
+    print(1);
+} else {
+    print(2);
+}
+if 0 || -0 {
+    print(3);
+}
+if 0 / 0 == 0 / 0 {
+    print(4);
+}
+"""
+    plain, optimized = outputs(program)
+    assert optimized == plain == ['2']
+
+def test_fractional_based_numbers():
+    # without the optimizer, fractional numbers in bases other than 2, 8 and 16 are truncated by parseInt
+    program = "print(1.A_12);\nprint(0.1_3);\nprint(1.011_2);\nprint(z.z_36);\n"
+    exact = [1 + Fraction(10, 12), Fraction(1, 3), Fraction(11, 8), 35 + Fraction(35, 36)]
+    assert run_node(compile(program, 'js', optimize=True)) == [repr(float(value)) for value in exact]
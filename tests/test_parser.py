@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+import parser
+
+def test_new_cache_removes_stale_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, 'CACHE_DIR', str(tmp_path))
+    stale = tmp_path / 'grammar.0123456789abcdef.lark-1.0.0.cache'
+    other = tmp_path / 'parser.cpython-312.pyc'
+    stale.write_text('')
+    other.write_text('')
+    parser.build_parser(parser.grammar)
+    current = parser.cache_file(parser.grammar)
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(current), other.name])
+
+    # loading an existing cache leaves the other files alone
+    stale.write_text('')
+    parser.build_parser(parser.grammar)
+    assert stale.exists()
+
+def test_standalone_to_stdout():
+    cli = os.path.join(os.path.dirname(os.path.realpath(parser.__file__)), 'cli.py')
+    output = subprocess.run([sys.executable, cli, 'standalone'], capture_output=True, text=True, check=True).stdout
+    assert 'def Lark_StandAlone(' in output
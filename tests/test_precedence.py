@@ -0,0 +1,65 @@
+import os
+import re
+
+import pytest
+
+from parser import parse
+from transpiler import transpile
+
+SYNTAX = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'syntax.md')
+
+def documented_groupings():
+    """(expression, explicitly grouped expression) pairs of the operator table of syntax.md"""
+    with open(SYNTAX) as f:
+        table = [line for line in f if line.startswith('| ')]
+    pairs = re.findall(r'`([^`]+)` is `([^`]+)`', ''.join(table))
+    return [(source.replace('\\|', '|'), grouped.replace('\\|', '|')) for source, grouped in pairs]
+
+def tree(expression):
+    return parse(f"x = {expression};").to_dict()
+
+# JavaScript emitted for each expression, parenthesized where JavaScript would group it differently
+GOLDEN = {
+    "2 ^ 3 ^ 2": "2 ** 3 ** 2",
+    "(2 ^ 3) ^ 2": "(2 ** 3) ** 2",
+    "-2 ^ 2": "- (2 ** 2)",
+    "(-2) ^ 2": "(- 2) ** 2",
+    "2 ^ -1": "2 ** - 1",
+    "8 / 4 / 2": "8 / 4 / 2",
+    "8 / (4 / 2)": "8 / (4 / 2)",
+    "1 - 2 - 3": "1 - 2 - 3",
+    "1 - (2 - 3)": "1 - (2 - 3)",
+    "1 + 2 * 3": "1 + 2 * 3",
+    "(1 + 2) * 3": "(1 + 2) * 3",
+    "(5 + 2 ^ 6) / 4": "(5 + 2 ** 6) / 4",
+    "a << 1 + 2": "a << 1 + 2",
+    "a >< b & c": "a ^ b & c",
+    "a & b | c": "a & b | c",
+    "a == b & c": "a == (b & c)",
+    "a + b < c": "a + b < c",
+    "a < b == c": "a < b == c",
+    "a == b < c": "(a == b) < c",
+    "a < b && c > d": "a < b && c > d",
+    "a || b && c": "a || b && c",
+    "(a || b) && c": "(a || b) && c",
+    "!a && b": "! a && b",
+    "!(a && b)": "! (a && b)",
+    "-(a + b) * c": "- (a + b) * c",
+    "a - -b": "a - - b",
+}
+
+def test_documented_table():
+    assert len(documented_groupings()) >= 12
+
+@pytest.mark.parametrize('source, grouped', documented_groupings())
+def test_documented_grouping(source, grouped):
+    assert tree(source) == tree(grouped)
+
+@pytest.mark.parametrize('source, other', [("1 - 2 - 3", "1 - (2 - 3)"), ("2 ^ 3 ^ 2", "(2 ^ 3) ^ 2"),
+                                           ("-2 ^ 2", "(-2) ^ 2"), ("a == b & c", "(a == b) & c")])
+def test_other_grouping(source, other):
+    assert tree(source) != tree(other)
+
+@pytest.mark.parametrize('source, output', GOLDEN.items())
+def test_emitted_grouping(source, output):
+    assert transpile(f"x = {source};").strip() == f"x = {output};"
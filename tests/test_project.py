@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from project import build
+
+def write(directory, files):
+    for name, code in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(code)
+    return os.path.join(directory, 'main.nv')
+
+SIBLINGS = {
+    'main.nv': "import first;\nimport second;\nprint(a + b);\n",
+    'first.nv': "var cfg = 1;\nval a = cfg;\n",
+    'second.nv': "var cfg = 2;\nval b = cfg;\n",
+}
+
+def test_bundle_rejects_shared_names(tmp_path):
+    entry = write(tmp_path, SIBLINGS)
+    for options in ({}, {'shake': True}):
+        with pytest.raises(Exception, match="CompileError: ident cfg is declared by both first and second"):
+            build(entry, 'js', jobs=1, **options)
+
+def test_bundle_rejects_shared_private_names(tmp_path):
+    entry = write(tmp_path, {**SIBLINGS, 'first.nv': "var #cfg = 1;\nval a = #cfg;\n",
+                             'second.nv': "var #cfg = 2;\nval b = #cfg;\n"})
+    with pytest.raises(Exception, match="ident _cfg is declared by both first and second"):
+        build(entry, 'js', jobs=1)
+
+def test_modules_reject_names_imported_twice(tmp_path):
+    with pytest.raises(Exception, match="main.nv: CompileError: ident cfg is imported from both first and second"):
+        build(write(tmp_path, SIBLINGS), 'js', format='modules', jobs=1)
+
+def test_modules_keep_private_names_apart(tmp_path):
+    entry = write(tmp_path, {**SIBLINGS, 'first.nv': "var #cfg = 1;\nval a = #cfg;\n",
+                             'second.nv': "var #cfg = 2;\nval b = #cfg;\n"})
+    assert len(build(entry, 'js', format='modules', jobs=1)) == 3
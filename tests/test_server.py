@@ -0,0 +1,51 @@
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+import pytest
+
+import client
+
+CLI = os.path.join(os.path.dirname(os.path.realpath(client.__file__)), 'cli.py')
+
+@pytest.fixture
+def daemon():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        address = f"127.0.0.1:{sock.getsockname()[1]}"
+    process = subprocess.Popen([sys.executable, CLI, 'serve', '--address', address, '-j', '1'],
+                               stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client.connect(address).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise
+            time.sleep(0.05)
+    yield address
+    process.send_signal(signal.SIGTERM)
+    _, errors = process.communicate(timeout=30)
+    assert 'Traceback' not in errors and 'Unhandled exception' not in errors
+
+def answer(sock, message):
+    sock.sendall(client.encode(message))
+    [length] = struct.unpack('>I', client.receive_exactly(sock, 4))
+    return json.loads(client.receive_exactly(sock, length))
+
+def test_non_object_requests(daemon):
+    with client.connect(daemon) as sock:
+        for message in ([1], "x", 3, None):
+            assert answer(sock, message)['error'] == f"TypeError: request must be a JSON object, not {type(message).__name__}"
+        # the connection is still answered after the errors
+        assert answer(sock, {'func': 'compile', 'code': "var x = 1;", 'lang': 'js'})['output'] == "let x  = 1;\n"
+
+def test_compile_without_lang(daemon):
+    assert client.request({'func': 'compile', 'code': "var x = 1;"}, daemon)['error'].startswith("ERROR: Please input a valid language")